@@ -0,0 +1,69 @@
+"""
+Shared dependencies and lookups for API routes.
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Sequence
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.auth import get_current_user
+from app.models.user import User
+from app.models.baby import Baby
+
+
+def load_owned_baby(
+    db: Session,
+    baby_id: int,
+    user_id: int,
+    options: Sequence = ()
+) -> Baby:
+    """
+    Load a baby owned by user_id or raise 404.
+
+    Uses a primary-key get, so a baby already in the session's identity map
+    costs no query. Async endpoints call this via run_in_threadpool.
+    """
+    baby = db.get(Baby, baby_id, options=options)
+
+    if not baby or baby.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Baby not found or you don't have permission to access it"
+        )
+
+    return baby
+
+
+def get_owned_baby(
+    baby_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> Baby:
+    """Dependency resolving a `baby_id` path parameter to the current user's baby."""
+    return load_owned_baby(db, baby_id, current_user.id)
+
+
+# One semaphore per user with LLM work in flight; entries disappear once no
+# request holds them
+_user_llm_semaphores: "weakref.WeakValueDictionary[int, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+
+@asynccontextmanager
+async def user_llm_slot(user_id: int) -> AsyncIterator[None]:
+    """
+    Hold one of a user's LLM_USER_CONCURRENCY slots for the enclosed LLM calls.
+
+    Keeps a single user's burst of requests from tripping the OpenAI rate
+    limit for everyone; other users are not held back.
+    """
+    semaphore = _user_llm_semaphores.get(user_id)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.LLM_USER_CONCURRENCY)
+        _user_llm_semaphores[user_id] = semaphore
+    async with semaphore:
+        yield
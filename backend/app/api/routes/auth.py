@@ -3,15 +3,22 @@ Authentication API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
 
 from app.core.database import get_db
 from app.core.auth import (
     get_password_hash,
-    verify_password,
+    authenticate_user,
+    forget_unknown_email,
     create_access_token,
     get_current_user,
+    optional_oauth2_scheme,
+    decode_access_token,
+    forget_token,
+    invalidate_cached_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.models.user import User
@@ -35,15 +42,9 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     - **password**: At least 6 characters
     - **phone**: Optional phone number
     """
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Create new user
+    # Create new user (the unique indexes on users.email and lower(email)
+    # reject duplicates, which also covers two registrations racing for the
+    # same email)
     new_user = User(
         email=user_data.email,
         hashed_password=get_password_hash(user_data.password),
@@ -51,14 +52,24 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    # Serialize before commit so expire-on-commit doesn't trigger a reload
+    user_response = UserResponse.model_validate(new_user)
     db.commit()
-    db.refresh(new_user)
+    forget_unknown_email(user_response.email)
     
     # Create access token
-    access_token = create_access_token(data={"sub": new_user.id})
+    access_token = create_access_token(data={"sub": user_response.id})
     
     return AuthResponse(
-        user=UserResponse.model_validate(new_user),
+        user=user_response,
         access_token=access_token,
         token_type="bearer"
     )
@@ -71,8 +82,8 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
     
     Returns user info and JWT access token
     """
-    # Find user by email
-    user = db.query(User).filter(User.email == user_data.email).first()
+    # Find user by email and verify password
+    user = authenticate_user(db, user_data.email, user_data.password)
     
     if not user:
         raise HTTPException(
@@ -80,13 +91,6 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
             detail="Incorrect email or password"
         )
     
-    # Verify password
-    if not verify_password(user_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password"
-        )
-    
     # Check if user is active
     if not user.is_active:
         raise HTTPException(
@@ -115,9 +119,9 @@ def login_for_token(
     Use this endpoint for testing in /docs
     """
     # Find user by email (username field in OAuth2 form)
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = authenticate_user(db, form_data.username, form_data.password)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -141,10 +145,20 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout")
-def logout():
+def logout(token: Optional[str] = Depends(optional_oauth2_scheme)):
     """
     Logout endpoint (for completeness)
     
     Note: JWT tokens are stateless. Client should delete the token.
+    If a token is sent, its cached claims and user profile are evicted.
     """
+    if token:
+        payload = decode_access_token(token)
+        forget_token(token)
+        if payload and payload.get("sub"):
+            try:
+                invalidate_cached_user(int(payload["sub"]))
+            except (ValueError, TypeError):
+                pass
+    
     return {"message": "Successfully logged out. Please delete your token."}
\ No newline at end of file
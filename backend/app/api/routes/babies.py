@@ -1,18 +1,26 @@
 """
 Baby management API routes with user authentication
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import func, case, update
+from sqlalchemy.orm import Session, raiseload
+from pydantic import TypeAdapter
 
-from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.core.cache import make_etag, etag_matches
+from app.core.database import get_db, get_read_db
+from app.core.auth import get_current_user, invalidate_owned_babies
 from app.models.user import User
 from app.models.baby import Baby
-from app.schemas.baby import BabyCreate, BabyUpdate, BabyResponse, BabyWithStats
+from app.models.feedback import Feedback
+from app.schemas.baby import BabyCreate, BabyUpdate, BabyResponse, BabyWithStats, BabyPage
 
 router = APIRouter()
 
+# Validates a whole result list from ORM objects in one pydantic-core call
+_baby_list_adapter = TypeAdapter(List[BabyResponse])
+
 
 @router.post("/", response_model=BabyResponse, status_code=status.HTTP_201_CREATED)
 def create_baby(
@@ -37,80 +45,102 @@ def create_baby(
         disliked_ingredients=baby.disliked_ingredients
     )
     db.add(db_baby)
+    # Flush (INSERT ... RETURNING id) and serialize before commit, so neither
+    # a refresh nor expire-on-commit costs another SELECT
+    db.flush()
+    response = BabyResponse.model_validate(db_baby)
     db.commit()
-    db.refresh(db_baby)
+    invalidate_owned_babies(current_user.id)
     
-    return db_baby
+    return response
 
 
-@router.get("/", response_model=List[BabyResponse])
+@router.get("/", response_model=BabyPage)
 def list_babies(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     List all babies for the current user
     
     Requires authentication. Only returns babies owned by the current user.
+    Uses keyset pagination: pass the returned `next_after_id` as `after_id`
+    to fetch the next page.
     """
-    babies = db.query(Baby).filter(
-        Baby.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    query = db.query(Baby).filter(Baby.user_id == current_user.id)
+    if after_id is not None:
+        query = query.filter(Baby.id > after_id)
+    
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    babies = query.order_by(Baby.id).limit(limit + 1).all()
+    has_next = len(babies) > limit
+    babies = babies[:limit]
+    
+    page = BabyPage(
+        items=_baby_list_adapter.validate_python(babies, from_attributes=True),
+        has_next=has_next,
+        next_after_id=babies[-1].id if has_next else None
+    )
     
-    return babies
+    # Returning a Response skips FastAPI's response_model re-validation of
+    # the already-validated page; pydantic-core serializes it straight to JSON
+    return Response(content=page.model_dump_json(), media_type="application/json")
 
 
 @router.get("/{baby_id}", response_model=BabyWithStats)
 def get_baby(
     baby_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get a specific baby's details with statistics
     
     Requires authentication. Users can only access their own babies.
+    Supports If-None-Match; the ETag covers the profile, today's date
+    (age changes) and the feedback statistics.
     """
-    baby = db.query(Baby).filter(
-        Baby.id == baby_id,
-        Baby.user_id == current_user.id
-    ).first()
+    # raiseload guards against accidental lazy loads (e.g. baby.feedbacks)
+    baby = db.get(Baby, baby_id, options=[raiseload("*")])
     
-    if not baby:
+    if not baby or baby.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Baby not found or you don't have permission to access it"
         )
     
-    # Calculate statistics
-    total_feedbacks = len(baby.feedbacks)
-    accepted_count = sum(1 for f in baby.feedbacks if f.accepted)
-    avg_rating = sum(f.rating for f in baby.feedbacks) / total_feedbacks if total_feedbacks > 0 else 0.0
+    # Calculate statistics in a single aggregate query
+    total_feedbacks, accepted_count, avg_rating = db.query(
+        func.count(Feedback.id),
+        func.sum(case((Feedback.accepted == True, 1), else_=0)),
+        func.avg(Feedback.rating)
+    ).filter(Feedback.baby_id == baby_id).one()
+    
+    accepted_count = accepted_count or 0
+    avg_rating = float(avg_rating or 0.0)
+    
+    cache_headers = {
+        "ETag": make_etag(baby_id, baby.updated_at, date.today(), total_feedbacks, accepted_count, avg_rating),
+        "Cache-Control": "private, no-cache"
+    }
+    if etag_matches(request, cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
     
     # Calculate acceptance rate
     acceptance_rate = (accepted_count / total_feedbacks * 100) if total_feedbacks > 0 else 0.0
     
     # Create response with stats
-    baby_dict = {
-        "id": baby.id,
-        "name": baby.name,
-        "birth_date": baby.birth_date,
-        "weight_kg": baby.weight_kg,
-        "height_cm": baby.height_cm,
-        "allergies": baby.allergies,
-        "liked_ingredients": baby.liked_ingredients,
-        "disliked_ingredients": baby.disliked_ingredients,
-        "created_at": baby.created_at,
-        "age_months": baby.age_months,
-        "age_stage": baby.get_age_stage(),
-        "total_feedbacks": total_feedbacks,
-        "average_rating": round(avg_rating, 2),
-        "acceptance_rate": round(acceptance_rate, 1)
-    }
+    baby_stats = BabyWithStats.model_validate(baby)
+    baby_stats.total_feedbacks = total_feedbacks
+    baby_stats.average_rating = round(avg_rating, 2)
+    baby_stats.acceptance_rate = round(acceptance_rate, 1)
     
-    return baby_dict
+    return baby_stats
 
 
 @router.patch("/{baby_id}", response_model=BabyResponse)
@@ -125,10 +155,19 @@ def update_baby(
     
     Requires authentication. Users can only update their own babies.
     """
-    db_baby = db.query(Baby).filter(
-        Baby.id == baby_id,
-        Baby.user_id == current_user.id
-    ).first()
+    # Update only provided fields; one UPDATE ... RETURNING also enforces ownership
+    update_data = baby_update.model_dump(exclude_unset=True)
+    if update_data:
+        db_baby = db.execute(
+            update(Baby)
+            .where(Baby.id == baby_id, Baby.user_id == current_user.id)
+            .values(**update_data)
+            .returning(Baby)
+        ).scalar_one_or_none()
+    else:
+        db_baby = db.get(Baby, baby_id)
+        if db_baby and db_baby.user_id != current_user.id:
+            db_baby = None
     
     if not db_baby:
         raise HTTPException(
@@ -136,15 +175,11 @@ def update_baby(
             detail="Baby not found or you don't have permission to update it"
         )
     
-    # Update only provided fields
-    update_data = baby_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_baby, field, value)
-    
+    # Serialize before commit so expire-on-commit doesn't trigger a reload
+    response = BabyResponse.model_validate(db_baby)
     db.commit()
-    db.refresh(db_baby)
     
-    return db_baby
+    return response
 
 
 @router.delete("/{baby_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -158,12 +193,9 @@ def delete_baby(
     
     Requires authentication. Users can only delete their own babies.
     """
-    db_baby = db.query(Baby).filter(
-        Baby.id == baby_id,
-        Baby.user_id == current_user.id
-    ).first()
+    db_baby = db.get(Baby, baby_id)
     
-    if not db_baby:
+    if not db_baby or db_baby.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Baby not found or you don't have permission to delete it"
@@ -171,5 +203,6 @@ def delete_baby(
     
     db.delete(db_baby)
     db.commit()
+    invalidate_owned_babies(current_user.id)
     
     return None
\ No newline at end of file
@@ -1,20 +1,36 @@
 """
 API routes for recipe management.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from pydantic import TypeAdapter
 
-from app.core.database import get_db
+from app.core.cache import make_etag, etag_matches
+from app.core.database import get_db, get_read_db
 from app.models.recipe import Recipe
+from app.services.recommendation_engine import invalidate_recipe_corpus
 from app.schemas.recipe import (
     RecipeCreate,
     RecipeUpdate,
-    RecipeResponse
+    RecipeResponse,
+    RecipePage
 )
 
 router = APIRouter()
 
+# Validates a whole result list in one pydantic-core call
+_recipe_list_adapter = TypeAdapter(List[RecipeResponse])
+
+# Columns backing RecipeResponse; list queries select these as plain rows
+# instead of hydrating ORM instances
+_RECIPE_RESPONSE_COLUMNS = tuple(getattr(Recipe, name) for name in RecipeResponse.model_fields)
+
+# Fields with Recipe attribute listeners (recipe_ingredients rows, cached
+# name/allergen sets); updates to them must go through the unit of work
+_LISTENED_RECIPE_FIELDS = frozenset({"ingredients", "allergens"})
+
 
 @router.post("/", response_model=RecipeResponse, status_code=status.HTTP_201_CREATED)
 def create_recipe(
@@ -33,57 +49,31 @@ def create_recipe(
     recipe = Recipe(**recipe_data.model_dump())
 
     db.add(recipe)
+    # Flush (INSERT ... RETURNING id) and serialize before commit, so neither
+    # a refresh nor expire-on-commit costs another SELECT
+    db.flush()
+    response = RecipeResponse.model_validate(recipe)
     db.commit()
-    db.refresh(recipe)
-
-    # Manually construct response with computed field
-    recipe_dict = {
-        "id": recipe.id,
-        "name": recipe.name,
-        "description": recipe.description,
-        "age_min_months": recipe.age_min_months,
-        "age_max_months": recipe.age_max_months,
-        "preparation_time_min": recipe.preparation_time_min,
-        "difficulty_level": recipe.difficulty_level,
-        "ingredients": recipe.ingredients,
-        "instructions": recipe.instructions,
-        "calories": recipe.calories,
-        "protein_g": recipe.protein_g,
-        "carbs_g": recipe.carbs_g,
-        "fat_g": recipe.fat_g,
-        "fiber_g": recipe.fiber_g,
-        "sugar_g": recipe.sugar_g,
-        "iron_mg": recipe.iron_mg,
-        "calcium_mg": recipe.calcium_mg,
-        "vitamin_a_mcg": recipe.vitamin_a_mcg,
-        "vitamin_c_mg": recipe.vitamin_c_mg,
-        "vitamin_d_mcg": recipe.vitamin_d_mcg,
-        "meal_type": recipe.meal_type,
-        "cuisine": recipe.cuisine,
-        "tags": recipe.tags,
-        "allergens": recipe.allergens,
-        "serving_size_g": recipe.serving_size_g,
-        "nutrition_score": recipe.get_nutrition_score()
-    }
+    invalidate_recipe_corpus()
 
-    return RecipeResponse(**recipe_dict)
+    return response
 
 
-@router.get("/", response_model=List[RecipeResponse])
+@router.get("/", response_model=RecipePage)
 def list_recipes(
-        skip: int = 0,
-        limit: int = 100,
+        after_id: Optional[int] = Query(None, description="Return recipes after this ID (keyset pagination)"),
+        limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
         age_min: Optional[int] = Query(None, description="Minimum age in months"),
         age_max: Optional[int] = Query(None, description="Maximum age in months"),
         meal_type: Optional[str] = Query(None, description="Filter by meal type"),
         tags: Optional[str] = Query(None, description="Comma-separated tags to filter by"),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_read_db)
 ):
     """
     List recipes with optional filtering and pagination.
 
     Args:
-        skip: Number of records to skip
+        after_id: ID of the last recipe from the previous page
         limit: Maximum number of records to return
         age_min: Filter recipes suitable for this minimum age
         age_max: Filter recipes suitable for this maximum age
@@ -91,9 +81,12 @@ def list_recipes(
         tags: Filter by tags (comma-separated)
 
     Returns:
-        List of recipes matching the filters
+        Page of recipes matching the filters with the cursor for the next page
     """
-    query = db.query(Recipe)
+    query = db.query(*_RECIPE_RESPONSE_COLUMNS)
+
+    if after_id is not None:
+        query = query.filter(Recipe.id > after_id)
 
     # Apply age filters
     if age_min is not None:
@@ -109,103 +102,66 @@ def list_recipes(
     if meal_type:
         query = query.filter(Recipe.meal_type == meal_type)
 
-    # Apply tags filter
+    # Apply tags filter (recipe must have all tags: one JSONB containment check)
     if tags:
-        tag_list = [t.strip() for t in tags.split(',')]
-        for tag in tag_list:
-            query = query.filter(Recipe.tags.contains([tag]))
-
-    recipes = query.offset(skip).limit(limit).all()
-
-    # Manually construct responses with computed fields
-    responses = []
-    for recipe in recipes:
-        recipe_dict = {
-            "id": recipe.id,
-            "name": recipe.name,
-            "description": recipe.description,
-            "age_min_months": recipe.age_min_months,
-            "age_max_months": recipe.age_max_months,
-            "preparation_time_min": recipe.preparation_time_min,
-            "difficulty_level": recipe.difficulty_level,
-            "ingredients": recipe.ingredients,
-            "instructions": recipe.instructions,
-            "calories": recipe.calories,
-            "protein_g": recipe.protein_g,
-            "carbs_g": recipe.carbs_g,
-            "fat_g": recipe.fat_g,
-            "fiber_g": recipe.fiber_g,
-            "sugar_g": recipe.sugar_g,
-            "iron_mg": recipe.iron_mg,
-            "calcium_mg": recipe.calcium_mg,
-            "vitamin_a_mcg": recipe.vitamin_a_mcg,
-            "vitamin_c_mg": recipe.vitamin_c_mg,
-            "vitamin_d_mcg": recipe.vitamin_d_mcg,
-            "meal_type": recipe.meal_type,
-            "cuisine": recipe.cuisine,
-            "tags": recipe.tags,
-            "allergens": recipe.allergens,
-            "serving_size_g": recipe.serving_size_g,
-            "nutrition_score": recipe.get_nutrition_score()
-        }
-        responses.append(RecipeResponse(**recipe_dict))
-
-    return responses
+        tag_list = [t.strip() for t in tags.split(',') if t.strip()]
+        if tag_list:
+            query = query.filter(Recipe.tags.op("@>")(tag_list))
+
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    recipes = query.order_by(Recipe.id).limit(limit + 1).all()
+    has_next = len(recipes) > limit
+    recipes = recipes[:limit]
+
+    page = RecipePage(
+        items=_recipe_list_adapter.validate_python([row._mapping for row in recipes]),
+        has_next=has_next,
+        next_after_id=recipes[-1].id if has_next else None
+    )
+
+    # Returning a Response skips FastAPI's response_model re-validation of
+    # the already-validated page; pydantic-core serializes it straight to JSON
+    return Response(content=page.model_dump_json(), media_type="application/json")
 
 
 @router.get("/{recipe_id}", response_model=RecipeResponse)
 def get_recipe(
         recipe_id: int,
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_read_db)
 ):
     """
     Get a specific recipe by ID.
 
+    Supports conditional requests: the response carries an ETag, and a
+    matching If-None-Match returns 304 Not Modified without a body.
+
     Args:
         recipe_id: Recipe ID
 
     Returns:
         Recipe details with nutrition score
     """
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    version = db.query(Recipe.updated_at).filter(Recipe.id == recipe_id).first()
 
-    if not recipe:
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Recipe with id {recipe_id} not found"
         )
 
-    # Manually construct response with computed field
-    recipe_dict = {
-        "id": recipe.id,
-        "name": recipe.name,
-        "description": recipe.description,
-        "age_min_months": recipe.age_min_months,
-        "age_max_months": recipe.age_max_months,
-        "preparation_time_min": recipe.preparation_time_min,
-        "difficulty_level": recipe.difficulty_level,
-        "ingredients": recipe.ingredients,
-        "instructions": recipe.instructions,
-        "calories": recipe.calories,
-        "protein_g": recipe.protein_g,
-        "carbs_g": recipe.carbs_g,
-        "fat_g": recipe.fat_g,
-        "fiber_g": recipe.fiber_g,
-        "sugar_g": recipe.sugar_g,
-        "iron_mg": recipe.iron_mg,
-        "calcium_mg": recipe.calcium_mg,
-        "vitamin_a_mcg": recipe.vitamin_a_mcg,
-        "vitamin_c_mg": recipe.vitamin_c_mg,
-        "vitamin_d_mcg": recipe.vitamin_d_mcg,
-        "meal_type": recipe.meal_type,
-        "cuisine": recipe.cuisine,
-        "tags": recipe.tags,
-        "allergens": recipe.allergens,
-        "serving_size_g": recipe.serving_size_g,
-        "nutrition_score": recipe.get_nutrition_score()
+    cache_headers = {
+        "ETag": make_etag(recipe_id, version.updated_at),
+        "Cache-Control": "private, max-age=60"
     }
+    if etag_matches(request, cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
 
-    return RecipeResponse(**recipe_dict)
+    recipe = db.get(Recipe, recipe_id)
+    response.headers.update(cache_headers)
+
+    return RecipeResponse.model_validate(recipe)
 
 
 @router.patch("/{recipe_id}", response_model=RecipeResponse)
@@ -224,7 +180,25 @@ def update_recipe(
     Returns:
         Updated recipe
     """
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    update_data = recipe_data.model_dump(exclude_unset=True)
+    if update_data.keys() & _LISTENED_RECIPE_FIELDS:
+        # Bulk UPDATEs don't fire attribute events: set these on the loaded
+        # row so its listeners rebuild recipe_ingredients
+        recipe = db.get(Recipe, recipe_id)
+        if recipe:
+            for field, value in update_data.items():
+                setattr(recipe, field, value)
+            db.flush()
+    elif update_data:
+        # Update only provided fields in a single UPDATE ... RETURNING
+        recipe = db.execute(
+            update(Recipe)
+            .where(Recipe.id == recipe_id)
+            .values(**update_data)
+            .returning(Recipe)
+        ).scalar_one_or_none()
+    else:
+        recipe = db.get(Recipe, recipe_id)
 
     if not recipe:
         raise HTTPException(
@@ -232,45 +206,17 @@ def update_recipe(
             detail=f"Recipe with id {recipe_id} not found"
         )
 
-    # Update only provided fields
-    update_data = recipe_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(recipe, field, value)
+    # Bulk UPDATEs skip mapper hooks, so keep the stored score in sync here
+    nutrition_score = recipe.get_nutrition_score()
+    if recipe.nutrition_score != nutrition_score:
+        recipe.nutrition_score = nutrition_score
 
+    # Serialize before commit so expire-on-commit doesn't trigger a reload
+    response = RecipeResponse.model_validate(recipe)
     db.commit()
-    db.refresh(recipe)
-
-    # Manually construct response with computed field
-    recipe_dict = {
-        "id": recipe.id,
-        "name": recipe.name,
-        "description": recipe.description,
-        "age_min_months": recipe.age_min_months,
-        "age_max_months": recipe.age_max_months,
-        "preparation_time_min": recipe.preparation_time_min,
-        "difficulty_level": recipe.difficulty_level,
-        "ingredients": recipe.ingredients,
-        "instructions": recipe.instructions,
-        "calories": recipe.calories,
-        "protein_g": recipe.protein_g,
-        "carbs_g": recipe.carbs_g,
-        "fat_g": recipe.fat_g,
-        "fiber_g": recipe.fiber_g,
-        "sugar_g": recipe.sugar_g,
-        "iron_mg": recipe.iron_mg,
-        "calcium_mg": recipe.calcium_mg,
-        "vitamin_a_mcg": recipe.vitamin_a_mcg,
-        "vitamin_c_mg": recipe.vitamin_c_mg,
-        "vitamin_d_mcg": recipe.vitamin_d_mcg,
-        "meal_type": recipe.meal_type,
-        "cuisine": recipe.cuisine,
-        "tags": recipe.tags,
-        "allergens": recipe.allergens,
-        "serving_size_g": recipe.serving_size_g,
-        "nutrition_score": recipe.get_nutrition_score()
-    }
+    invalidate_recipe_corpus()
 
-    return RecipeResponse(**recipe_dict)
+    return response
 
 
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -284,7 +230,7 @@ def delete_recipe(
     Args:
         recipe_id: Recipe ID
     """
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    recipe = db.get(Recipe, recipe_id)
 
     if not recipe:
         raise HTTPException(
@@ -294,5 +240,6 @@ def delete_recipe(
 
     db.delete(recipe)
     db.commit()
+    invalidate_recipe_corpus()
 
     return None
\ No newline at end of file
@@ -2,15 +2,25 @@
 API routes for recipe recommendations and feedback management.
 Includes both basic (MVP) and AI-enhanced endpoints with user authentication.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from functools import lru_cache
+
+import numpy as np
+import orjson
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import exists, func, insert, select, update
+from sqlalchemy.orm import Session, load_only, selectinload
 from typing import List, Dict, Optional, Any
+from datetime import date, timedelta
 
-from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.api.deps import get_owned_baby, load_owned_baby, user_llm_slot
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.auth import get_current_user, user_owns_baby
 from app.models.user import User
 from app.models.baby import Baby
-from app.models.recipe import Recipe
+from app.models.recipe import Recipe, RECIPE_RESPONSE_FIELDS
 from app.models.feedback import Feedback
 
 # Original schemas
@@ -18,6 +28,7 @@ from app.schemas.feedback import (
     FeedbackCreate,
     FeedbackUpdate,
     FeedbackResponse,
+    FeedbackPage,
     RecommendationRequest
 )
 from app.schemas.recipe import RecipeWithScore
@@ -41,17 +52,31 @@ from app.schemas.smart_recommendation import (
 )
 
 # Original engine
-from app.services.recommendation_engine import RecommendationEngine
+from app.services.recommendation_engine import (
+    RecommendationEngine,
+    get_recommendation_engine,
+    get_cached_recommendations,
+    cache_recommendations,
+    invalidate_recommendations,
+    invalidate_recipe_stats,
+)
 
 # New AI-enhanced services
 try:
     from app.services.smart_recommendation_engine import SmartRecommendationEngine
-    from app.services.llm_service import LLMService
+    from app.services.llm_service import LLMService, get_llm_service
     from app.services.preference_handler import PreferenceHandler
     SMART_FEATURES_AVAILABLE = True
 except ImportError:
     SMART_FEATURES_AVAILABLE = False
     print("Warning: Smart features not available. Install dependencies and create service files.")
+    LLMService = None
+    
+    def get_llm_service():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Smart features not available"
+        )
 
 
 router = APIRouter()
@@ -64,7 +89,8 @@ router = APIRouter()
 @router.post("/", response_model=List[RecipeWithScore])
 def get_recommendations(
     request: RecommendationRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    engine: RecommendationEngine = Depends(get_recommendation_engine),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -80,22 +106,18 @@ def get_recommendations(
         List of recommended recipes with scores and basic explanations
     """
     # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
-    
-    # Get recommendations using original engine
-    engine = RecommendationEngine(db)
+    baby = load_owned_baby(db, request.baby_id, current_user.id)
     
     exclude_days = 7 if request.exclude_recently_recommended else 0
     
+    # Reuse today's result unless the profile changed (updated_at) or
+    # feedback/recipes were written since (those invalidate explicitly)
+    cache_variant = (request.meal_type, request.count, exclude_days, date.today(), baby.updated_at)
+    cached = get_cached_recommendations(baby.id, cache_variant)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    # Get recommendations using original engine
     recommendations = engine.get_recommendations(
         baby=baby,
         count=request.count,
@@ -103,42 +125,18 @@ def get_recommendations(
         exclude_recent_days=exclude_days
     )
     
-    # Format response
-    responses = []
-    for recipe, score, reason in recommendations:
-        recipe_dict = {
-            "id": recipe.id,
-            "name": recipe.name,
-            "description": recipe.description,
-            "age_min_months": recipe.age_min_months,
-            "age_max_months": recipe.age_max_months,
-            "preparation_time_min": recipe.preparation_time_min,
-            "difficulty_level": recipe.difficulty_level,
-            "ingredients": recipe.ingredients,
-            "instructions": recipe.instructions,
-            "calories": recipe.calories,
-            "protein_g": recipe.protein_g,
-            "carbs_g": recipe.carbs_g,
-            "fat_g": recipe.fat_g,
-            "fiber_g": recipe.fiber_g,
-            "sugar_g": recipe.sugar_g,
-            "iron_mg": recipe.iron_mg,
-            "calcium_mg": recipe.calcium_mg,
-            "vitamin_a_mcg": recipe.vitamin_a_mcg,
-            "vitamin_c_mg": recipe.vitamin_c_mg,
-            "vitamin_d_mcg": recipe.vitamin_d_mcg,
-            "meal_type": recipe.meal_type,
-            "cuisine": recipe.cuisine,
-            "tags": recipe.tags,
-            "allergens": recipe.allergens,
-            "serving_size_g": recipe.serving_size_g,
-            "nutrition_score": recipe.get_nutrition_score(),
-            "recommendation_score": round(score, 3),
-            "match_reason": reason
-        }
-        responses.append(RecipeWithScore(**recipe_dict))
+    # Format response as plain dicts and encode once; the bytes are cached
+    rounded_scores = np.round([score for _, score, _ in recommendations], 3).tolist()
+    responses = [
+        {**recipe.to_response_dict(), "recommendation_score": score, "match_reason": reason}
+        for (recipe, _, reason), score in zip(recommendations, rounded_scores)
+    ]
     
-    return responses
+    body = orjson.dumps(responses)
+    cache_recommendations(baby.id, cache_variant, body)
+    # Returning a Response skips FastAPI's response_model re-validation; the
+    # model stays on the decorator for the OpenAPI schema
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/feedback", response_model=FeedbackResponse, status_code=status.HTTP_201_CREATED)
@@ -159,109 +157,144 @@ def submit_feedback(
     Returns:
         Created feedback with computed score
     """
-    # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
+    # Verify baby ownership and recipe existence in a single statement
+    found = db.query(Baby.id, Recipe.id).join(
+        Recipe, Recipe.id == feedback_data.recipe_id
+    ).filter(
         Baby.id == feedback_data.baby_id,
         Baby.user_id == current_user.id
     ).first()
     
-    if not baby:
+    if not found:
+        # Only the error path pays for working out which check failed
+        owns_baby = db.query(
+            exists().where(Baby.id == feedback_data.baby_id, Baby.user_id == current_user.id)
+        ).scalar()
+        if not owns_baby:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Baby not found or you don't have permission to access it"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
+            detail=f"Recipe with id {feedback_data.recipe_id} not found"
         )
     
-    # Verify recipe exists
-    recipe = db.query(Recipe).filter(Recipe.id == feedback_data.recipe_id).first()
-    if not recipe:
+    # Create feedback; INSERT ... RETURNING hands back ids and defaults in one
+    # round trip, and serializing before commit avoids a reload
+    feedback = db.scalars(
+        insert(Feedback).returning(Feedback),
+        [feedback_data.model_dump()]
+    ).one()
+    response = feedback.to_response_dict()
+    db.commit()
+    invalidate_recommendations(feedback_data.baby_id)
+    invalidate_recipe_stats([feedback_data.recipe_id])
+    
+    return ORJSONResponse(response, status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/feedback/batch", response_model=List[FeedbackResponse], status_code=status.HTTP_201_CREATED)
+def submit_feedback_batch(
+    feedback_batch: List[FeedbackCreate] = Body(..., max_length=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Submit several feedbacks at once (e.g. all ratings for a meal).
+    
+    The whole batch is validated up front and inserted in one statement
+    and one transaction, so either every feedback is saved or none is.
+    
+    Requires authentication. Users can only submit feedback for their own babies.
+    
+    Args:
+        feedback_batch: List of feedbacks (at most 100)
+        
+    Returns:
+        Created feedbacks with computed scores, in request order
+    """
+    if not feedback_batch:
+        return ORJSONResponse([], status_code=status.HTTP_201_CREATED)
+    
+    # Authorize every referenced baby with one query
+    baby_ids = {fd.baby_id for fd in feedback_batch}
+    owned_ids = set(db.scalars(
+        select(Baby.id).where(Baby.id.in_(baby_ids), Baby.user_id == current_user.id)
+    ))
+    missing_babies = baby_ids - owned_ids
+    if missing_babies:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Recipe with id {feedback_data.recipe_id} not found"
+            detail=f"Baby {min(missing_babies)} not found or you don't have permission to access it"
         )
     
-    # Create feedback
-    feedback = Feedback(**feedback_data.model_dump())
+    # Validate every referenced recipe with one query
+    recipe_ids = {fd.recipe_id for fd in feedback_batch}
+    found_ids = set(db.scalars(select(Recipe.id).where(Recipe.id.in_(recipe_ids))))
+    missing_recipes = recipe_ids - found_ids
+    if missing_recipes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Recipe with id {min(missing_recipes)} not found"
+        )
     
-    db.add(feedback)
+    # Bulk INSERT ... RETURNING; serialize before commit expires the rows
+    feedbacks = Feedback.bulk_insert(db, [fd.model_dump() for fd in feedback_batch])
+    responses = [feedback.to_response_dict() for feedback in feedbacks]
     db.commit()
-    db.refresh(feedback)
-    
-    # Manually construct response with computed field
-    feedback_dict = {
-        "id": feedback.id,
-        "baby_id": feedback.baby_id,
-        "recipe_id": feedback.recipe_id,
-        "rating": feedback.rating,
-        "accepted": feedback.accepted,
-        "prepared": feedback.prepared,
-        "baby_liked": feedback.baby_liked,
-        "comments": feedback.comments,
-        "rejection_reason": feedback.rejection_reason,
-        "recommended_at": feedback.recommended_at,
-        "feedback_at": feedback.feedback_at,
-        "feedback_score": feedback.get_feedback_score()
-    }
     
-    return FeedbackResponse(**feedback_dict)
+    for baby_id in baby_ids:
+        invalidate_recommendations(baby_id)
+    invalidate_recipe_stats(recipe_ids)
+    
+    return ORJSONResponse(responses, status_code=status.HTTP_201_CREATED)
 
 
-@router.get("/feedback/{baby_id}", response_model=List[FeedbackResponse])
+@router.get("/feedback/{baby_id}", response_model=FeedbackPage)
 def get_baby_feedbacks(
     baby_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get all feedbacks for a specific baby.
+    Get all feedbacks for a specific baby, newest first.
     
     Requires authentication. Users can only access feedbacks for their own babies.
+    Uses keyset pagination: pass the returned `next_before_id` as `before_id`
+    to fetch the next (older) page.
     
     Args:
         baby_id: Baby profile ID
-        skip: Number of records to skip
+        before_id: Only return feedbacks older than this feedback id
         limit: Maximum number of records to return
         
     Returns:
-        List of feedbacks with scores
+        Page of feedbacks with scores
     """
-    # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
+    # Verify baby exists and belongs to current user (cached, the id is all we need)
+    if not user_owns_baby(db, current_user.id, baby_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Baby not found or you don't have permission to access it"
         )
     
-    feedbacks = db.query(Feedback).filter(
-        Feedback.baby_id == baby_id
-    ).offset(skip).limit(limit).all()
-    
-    # Manually construct responses with computed fields
-    responses = []
-    for feedback in feedbacks:
-        feedback_dict = {
-            "id": feedback.id,
-            "baby_id": feedback.baby_id,
-            "recipe_id": feedback.recipe_id,
-            "rating": feedback.rating,
-            "accepted": feedback.accepted,
-            "prepared": feedback.prepared,
-            "baby_liked": feedback.baby_liked,
-            "comments": feedback.comments,
-            "rejection_reason": feedback.rejection_reason,
-            "recommended_at": feedback.recommended_at,
-            "feedback_at": feedback.feedback_at,
-            "feedback_score": feedback.get_feedback_score()
-        }
-        responses.append(FeedbackResponse(**feedback_dict))
+    query = db.query(Feedback).filter(Feedback.baby_id == baby_id)
+    if before_id is not None:
+        query = query.filter(Feedback.id < before_id)
+    
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    feedbacks = query.order_by(Feedback.id.desc()).limit(limit + 1).all()
+    has_next = len(feedbacks) > limit
+    feedbacks = feedbacks[:limit]
     
-    return responses
+    return ORJSONResponse({
+        "items": [feedback.to_response_dict() for feedback in feedbacks],
+        "has_next": has_next,
+        "next_before_id": feedbacks[-1].id if has_next else None,
+    })
 
 
 @router.patch("/feedback/{feedback_id}", response_model=FeedbackResponse)
@@ -284,7 +317,25 @@ def update_feedback(
     Returns:
         Updated feedback
     """
-    feedback = db.query(Feedback).filter(Feedback.id == feedback_id).first()
+    # Update only provided fields; one UPDATE ... RETURNING also enforces
+    # that the feedback's baby belongs to current user
+    update_data = feedback_data.model_dump(exclude_unset=True)
+    if update_data:
+        owned_by_user = select(Baby.id).where(
+            Baby.id == Feedback.baby_id,
+            Baby.user_id == current_user.id
+        ).exists()
+        feedback = db.execute(
+            update(Feedback)
+            .where(Feedback.id == feedback_id, owned_by_user)
+            .values(**update_data)
+            .returning(Feedback)
+        ).scalar_one_or_none()
+    else:
+        feedback = db.query(Feedback).join(Baby, Baby.id == Feedback.baby_id).filter(
+            Feedback.id == feedback_id,
+            Baby.user_id == current_user.id
+        ).first()
     
     if not feedback:
         raise HTTPException(
@@ -292,43 +343,13 @@ def update_feedback(
             detail=f"Feedback with id {feedback_id} not found"
         )
     
-    # Verify the feedback's baby belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == feedback.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to update this feedback"
-        )
-    
-    # Update only provided fields
-    update_data = feedback_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(feedback, field, value)
-    
+    # Serialize before commit so expire-on-commit doesn't trigger a reload
+    response = feedback.to_response_dict()
     db.commit()
-    db.refresh(feedback)
-    
-    # Manually construct response with computed field
-    feedback_dict = {
-        "id": feedback.id,
-        "baby_id": feedback.baby_id,
-        "recipe_id": feedback.recipe_id,
-        "rating": feedback.rating,
-        "accepted": feedback.accepted,
-        "prepared": feedback.prepared,
-        "baby_liked": feedback.baby_liked,
-        "comments": feedback.comments,
-        "rejection_reason": feedback.rejection_reason,
-        "recommended_at": feedback.recommended_at,
-        "feedback_at": feedback.feedback_at,
-        "feedback_score": feedback.get_feedback_score()
-    }
+    invalidate_recommendations(response["baby_id"])
+    invalidate_recipe_stats([response["recipe_id"]])
     
-    return FeedbackResponse(**feedback_dict)
+    return ORJSONResponse(response)
 
 
 @router.delete("/feedback/{feedback_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -345,7 +366,11 @@ def delete_feedback(
     Args:
         feedback_id: Feedback ID
     """
-    feedback = db.query(Feedback).filter(Feedback.id == feedback_id).first()
+    # Fetch the feedback only if its baby belongs to current user
+    feedback = db.query(Feedback).join(Baby, Baby.id == Feedback.baby_id).filter(
+        Feedback.id == feedback_id,
+        Baby.user_id == current_user.id
+    ).first()
     
     if not feedback:
         raise HTTPException(
@@ -353,20 +378,11 @@ def delete_feedback(
             detail=f"Feedback with id {feedback_id} not found"
         )
     
-    # Verify the feedback's baby belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == feedback.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have permission to delete this feedback"
-        )
-    
+    baby_id, recipe_id = feedback.baby_id, feedback.recipe_id
     db.delete(feedback)
     db.commit()
+    invalidate_recommendations(baby_id)
+    invalidate_recipe_stats([recipe_id])
     
     return None
 
@@ -379,7 +395,8 @@ def delete_feedback(
 def get_smart_recommendations(
     request: RecommendationRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Get AI-enhanced recommendations with intelligent preference handling.
@@ -404,21 +421,12 @@ def get_smart_recommendations(
             detail="Smart features not available. Check service files and dependencies."
         )
     
-    # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
+    # Verify baby exists and belongs to current user; the engine scores
+    # against the feedback history, so load it alongside the baby
+    baby = load_owned_baby(db, request.baby_id, current_user.id, options=[selectinload(Baby.feedbacks)])
     
     # Initialize services
     try:
-        llm_service = LLMService()
         engine = SmartRecommendationEngine(db, llm_service)
     except Exception as e:
         raise HTTPException(
@@ -433,14 +441,78 @@ def get_smart_recommendations(
         meal_type=request.meal_type
     )
     
-    return SmartRecommendationResponse(**result)
+    # The engine builds plain dicts in the response shape; FastAPI validates
+    # them once against response_model, so don't build the model here too
+    return result
+
+
+@router.post("/smart/stream")
+def get_smart_recommendations_stream(
+    request: RecommendationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Get AI-enhanced recommendations, streaming each section as it is ready.
+    
+    Same input as POST /smart. The response is newline-delimited JSON
+    (application/x-ndjson) with one `{"section": ..., "data": ...}` object
+    per line: primary_recommendations, alternatives and retry_suggestions
+    with rule-based text as soon as they are computed, then `complete`,
+    whose data is the full POST /smart response including the LLM-written
+    text. Requires authentication.
+    
+    Args:
+        request: Recommendation parameters
+        
+    Returns:
+        NDJSON stream of recommendation sections
+    """
+    if not SMART_FEATURES_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Smart features not available. Check service files and dependencies."
+        )
+    
+    # Verify baby exists and belongs to current user (feedbacks for scoring)
+    baby = load_owned_baby(db, request.baby_id, current_user.id, options=[selectinload(Baby.feedbacks)])
+    
+    # Initialize services
+    try:
+        engine = SmartRecommendationEngine(db, llm_service)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to initialize AI services: {str(e)}"
+        )
+    
+    def lines():
+        # Encode each section when yielded; the LLM pass later edits it in place
+        for section, data in engine.iter_smart_recommendations(
+            baby=baby,
+            count=request.count,
+            meal_type=request.meal_type
+        ):
+            if section == "complete":
+                # Same validation and shape as POST /smart's response_model
+                data = SmartRecommendationResponse.model_validate(data).model_dump()
+            yield orjson.dumps({"section": section, "data": data}) + b"\n"
+    
+    # Sync iterator: Starlette runs each step in the threadpool
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/alternatives", response_model=AlternativesForIngredient)
 def get_ingredient_alternatives(
     request: AlternativeRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Get nutritional alternatives for a disliked ingredient.
@@ -463,19 +535,9 @@ def get_ingredient_alternatives(
         )
     
     # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
+    baby = load_owned_baby(db, request.baby_id, current_user.id)
     
     # Initialize services
-    llm_service = LLMService()
     handler = PreferenceHandler(db, llm_service)
     
     # Get alternatives
@@ -492,7 +554,8 @@ def get_ingredient_alternatives(
 def get_retry_strategy(
     request: RetryStrategyRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Get intelligent retry strategy for a disliked ingredient.
@@ -517,18 +580,8 @@ def get_retry_strategy(
         )
     
     # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
+    baby = load_owned_baby(db, request.baby_id, current_user.id)
     
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
-    
-    llm_service = LLMService()
     handler = PreferenceHandler(db, llm_service)
     
     # Check if should retry
@@ -569,10 +622,11 @@ def get_retry_strategy(
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_with_ai(
+async def chat_with_ai(
     request: ChatRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Chat with AI nutrition assistant.
@@ -593,18 +647,7 @@ def chat_with_ai(
         )
     
     # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
-    
-    llm_service = LLMService()
+    baby = await run_in_threadpool(load_owned_baby, db, request.baby_id, current_user.id)
     
     # Convert conversation history to LLM format
     history = [
@@ -613,23 +656,78 @@ def chat_with_ai(
     ]
     
     # Get AI response
-    response = llm_service.chat_with_context(
-        user_message=request.message,
-        baby=baby,
-        conversation_history=history
-    )
+    async with user_llm_slot(current_user.id):
+        response = await llm_service.achat_with_context(
+            user_message=request.message,
+            baby=baby,
+            conversation_history=history
+        )
     
-    return ChatResponse(
+    return ChatResponse.model_construct(
         message=response,
         suggested_actions=None
     )
 
 
+@router.post("/chat/stream")
+async def chat_with_ai_stream(
+    request: ChatRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Chat with AI nutrition assistant, streaming the answer.
+    
+    Same input as POST /chat. The response is a text/event-stream whose
+    events carry `{"content": "<fragment>"}` as they are generated,
+    followed by a final `data: [DONE]`. Requires authentication.
+    
+    Args:
+        request: Chat message with conversation history
+        
+    Returns:
+        Server-Sent Events stream of answer fragments
+    """
+    if not SMART_FEATURES_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Smart features not available"
+        )
+    
+    # Verify baby exists and belongs to current user
+    baby = await run_in_threadpool(load_owned_baby, db, request.baby_id, current_user.id)
+    
+    # Convert conversation history to LLM format
+    history = [
+        {"role": msg.role, "content": msg.content}
+        for msg in request.conversation_history
+    ]
+    
+    async def events():
+        async with user_llm_slot(current_user.id):
+            async for fragment in llm_service.achat_stream(
+                user_message=request.message,
+                baby=baby,
+                conversation_history=history
+            ):
+                # JSON-encode each fragment so newlines can't break SSE framing
+                yield b"data: " + orjson.dumps({"content": fragment}) + b"\n\n"
+        yield b"data: [DONE]\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/weekly-plan", response_model=Dict)
-def generate_weekly_plan(
+async def generate_weekly_plan(
     request: WeeklyPlanRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Generate AI-powered weekly meal plan.
@@ -655,34 +753,90 @@ def generate_weekly_plan(
         )
     
     # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
+    baby = await run_in_threadpool(load_owned_baby, db, request.baby_id, current_user.id)
     
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
+    # Generate weekly plan
+    async with user_llm_slot(current_user.id):
+        plan = await llm_service.agenerate_weekly_meal_plan(
+            baby=baby,
+            preferences=request.preferences
         )
     
-    llm_service = LLMService()
+    return plan
+
+
+# Nutrients reported by /nutrition-analysis
+_NUTRIENT_COLUMNS = (
+    Recipe.iron_mg,
+    Recipe.calcium_mg,
+    Recipe.protein_g,
+    Recipe.fiber_g,
+    Recipe.vitamin_a_mcg
+)
+_NUTRIENT_NAMES = np.array([column.key for column in _NUTRIENT_COLUMNS])
+
+# Recommended daily intake for each of _NUTRIENT_COLUMNS, in the same order
+_DAILY_NUTRIENT_TARGETS = np.array([11, 260, 11, 5, 500], dtype=float)
+
+# Meals listed by name in the LLM trend prompt
+_TREND_PROMPT_MEALS = 10
+
+
+@lru_cache(maxsize=64)
+def _nutrient_targets_for(days: int):
+    """Targets for a `days`-long period, as a read-only vector and as the response dict."""
+    targets = _DAILY_NUTRIENT_TARGETS * days
+    targets.flags.writeable = False
+    return targets, dict(zip(_NUTRIENT_NAMES.tolist(), targets.tolist()))
+
+
+def _load_recent_nutrition(db: Session, baby_id: int, days: int):
+    """
+    Aggregate nutrients over the recipes prepared for a baby in the last `days` days.
+    
+    Totals are summed by the database in one row; only the few meals the
+    LLM prompt lists are fetched, as plain rows.
     
-    # Generate weekly plan
-    plan = llm_service.generate_weekly_meal_plan(
-        baby=baby,
-        preferences=request.preferences
+    Returns:
+        (meal count, nutrient totals, meals for the prompt)
+    """
+    # Get recent meals from feedback
+    cutoff_date = date.today() - timedelta(days=days)
+    
+    recent_recipe_ids = db.query(Feedback.recipe_id).filter(
+        Feedback.baby_id == baby_id,
+        Feedback.recommended_at >= cutoff_date,
+        Feedback.prepared == True
     )
+    # Feedback ids resolved as a subquery, not a separate round trip
+    is_recent = Recipe.id.in_(recent_recipe_ids)
     
-    return plan
+    meal_count, *totals = db.query(
+        func.count(Recipe.id),
+        *(func.coalesce(func.sum(column), 0.0) for column in _NUTRIENT_COLUMNS)
+    ).filter(is_recent).one()
+    
+    if not meal_count:
+        return 0, {}, []
+    
+    nutrient_totals = {
+        column.key: float(total) for column, total in zip(_NUTRIENT_COLUMNS, totals)
+    }
+    # Plain rows carrying just what the prompt prints, no ORM instances
+    prompt_meals = db.query(
+        Recipe.name, Recipe.iron_mg, Recipe.protein_g, Recipe.calcium_mg
+    ).filter(is_recent).limit(_TREND_PROMPT_MEALS).all()
+    
+    return meal_count, nutrient_totals, prompt_meals
 
 
 @router.get("/nutrition-analysis/{baby_id}", response_model=NutritionAnalysisResponse)
-def get_nutrition_analysis(
+async def get_nutrition_analysis(
     baby_id: int,
     days: int = 7,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    baby: Baby = Depends(get_owned_baby),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Get AI-powered nutrition analysis for recent meals.
@@ -707,34 +861,15 @@ def get_nutrition_analysis(
             detail="Smart features not available"
         )
     
-    # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
-    
-    # Get recent meals from feedback
-    from datetime import date, timedelta
-    cutoff_date = date.today() - timedelta(days=days)
-    
-    recent_feedbacks = db.query(Feedback).filter(
-        Feedback.baby_id == baby_id,
-        Feedback.recommended_at >= cutoff_date,
-        Feedback.prepared == True
-    ).all()
-    
-    # Get recipes
-    recipe_ids = [f.recipe_id for f in recent_feedbacks]
-    recent_recipes = db.query(Recipe).filter(Recipe.id.in_(recipe_ids)).all()
+    # Ownership is enforced by get_owned_baby; aggregate off the event loop
+    meal_count, nutrient_totals, prompt_meals = await run_in_threadpool(
+        _load_recent_nutrition, db, baby_id, days
+    )
     
-    if not recent_recipes:
-        return NutritionAnalysisResponse(
+    # Responses are built from our own values and validated against
+    # response_model on the way out; model_construct skips a second pass
+    if not meal_count:
+        return NutritionAnalysisResponse.model_construct(
             period=f"past {days} days",
             total_meals=0,
             nutrient_totals={},
@@ -745,48 +880,28 @@ def get_nutrition_analysis(
             excesses=[]
         )
     
-    # Calculate nutrient totals
-    nutrient_totals = {
-        "iron_mg": sum(r.iron_mg or 0.0 for r in recent_recipes),
-        "calcium_mg": sum(r.calcium_mg or 0.0 for r in recent_recipes),
-        "protein_g": sum(r.protein_g or 0.0 for r in recent_recipes),
-        "fiber_g": sum(r.fiber_g or 0.0 for r in recent_recipes),
-        "vitamin_a_mcg": sum(r.vitamin_a_mcg or 0.0 for r in recent_recipes)
-    }
-    
-    # Recommended targets (for the time period)
-    daily_targets = {
-        "iron_mg": 11,
-        "calcium_mg": 260,
-        "protein_g": 11,
-        "fiber_g": 5,
-        "vitamin_a_mcg": 500
-    }
-    
-    nutrient_targets = {k: v * days for k, v in daily_targets.items()}
+    # Totals and targets as aligned vectors, so the threshold checks below
+    # are single array comparisons
+    totals = np.fromiter(nutrient_totals.values(), dtype=float, count=len(_NUTRIENT_NAMES))
+    targets, nutrient_targets = _nutrient_targets_for(days)
     
     # Get LLM analysis
-    llm_service = LLMService()
-    analysis = llm_service.analyze_nutrition_trend(
-        baby=baby,
-        recent_meals=recent_recipes,
-        time_period=f"past {days} days"
-    )
+    async with user_llm_slot(baby.user_id):
+        analysis = await llm_service.aanalyze_nutrition_trend(
+            baby=baby,
+            recent_meals=prompt_meals,
+            time_period=f"past {days} days",
+            nutrient_totals=nutrient_totals,
+            meal_count=meal_count
+        )
     
     # Identify deficiencies and excesses
-    deficiencies = [
-        nutrient for nutrient, total in nutrient_totals.items()
-        if total < nutrient_targets[nutrient] * 0.7
-    ]
-    
-    excesses = [
-        nutrient for nutrient, total in nutrient_totals.items()
-        if total > nutrient_targets[nutrient] * 1.5
-    ]
+    deficiencies = _NUTRIENT_NAMES[totals < targets * 0.7].tolist()
+    excesses = _NUTRIENT_NAMES[totals > targets * 1.5].tolist()
     
-    return NutritionAnalysisResponse(
+    return NutritionAnalysisResponse.model_construct(
         period=f"past {days} days",
-        total_meals=len(recent_recipes),
+        total_meals=meal_count,
         nutrient_totals=nutrient_totals,
         nutrient_targets=nutrient_targets,
         assessment=analysis,
@@ -796,11 +911,29 @@ def get_nutrition_analysis(
     )
 
 
+# Recipe columns backing RecipeResponse (what adapt-recipe reads)
+_RECIPE_RESPONSE_COLUMNS = tuple(getattr(Recipe, name) for name in RECIPE_RESPONSE_FIELDS)
+
+
+def _load_recipe_for_baby(db: Session, recipe_id: int, baby_id: int, user_id: int):
+    """Load a recipe and an owned baby, raising 404 if either is missing."""
+    # Only the columns the prompt and original_recipe read
+    recipe = db.get(Recipe, recipe_id, options=[load_only(*_RECIPE_RESPONSE_COLUMNS)])
+    if not recipe:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Recipe with id {recipe_id} not found"
+        )
+    
+    return recipe, load_owned_baby(db, baby_id, user_id)
+
+
 @router.post("/adapt-recipe", response_model=RecipeAdaptationResponse)
-def adapt_recipe(
+async def adapt_recipe(
     request: RecipeAdaptationRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Adapt a recipe based on specific needs.
@@ -824,65 +957,21 @@ def adapt_recipe(
             detail="Smart features not available"
         )
     
-    recipe = db.query(Recipe).filter(Recipe.id == request.recipe_id).first()
-    if not recipe:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Recipe with id {request.recipe_id} not found"
-        )
-    
-    # Verify baby exists and belongs to current user
-    baby = db.query(Baby).filter(
-        Baby.id == request.baby_id,
-        Baby.user_id == current_user.id
-    ).first()
-    
-    if not baby:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Baby not found or you don't have permission to access it"
-        )
+    recipe, baby = await run_in_threadpool(
+        _load_recipe_for_baby, db, request.recipe_id, request.baby_id, current_user.id
+    )
     
     # Get adapted recipe from LLM
-    llm_service = LLMService()
-    adapted = llm_service.adapt_recipe(
-        recipe=recipe,
-        adaptation_request=request.adaptation_request,
-        baby=baby
-    )
+    async with user_llm_slot(current_user.id):
+        adapted = await llm_service.aadapt_recipe(
+            recipe=recipe,
+            adaptation_request=request.adaptation_request,
+            baby=baby
+        )
     
-    # Format original recipe
-    original_recipe_dict = {
-        "id": recipe.id,
-        "name": recipe.name,
-        "description": recipe.description,
-        "age_min_months": recipe.age_min_months,
-        "age_max_months": recipe.age_max_months,
-        "preparation_time_min": recipe.preparation_time_min,
-        "difficulty_level": recipe.difficulty_level,
-        "ingredients": recipe.ingredients,
-        "instructions": recipe.instructions,
-        "calories": recipe.calories,
-        "protein_g": recipe.protein_g,
-        "carbs_g": recipe.carbs_g,
-        "fat_g": recipe.fat_g,
-        "fiber_g": recipe.fiber_g,
-        "sugar_g": recipe.sugar_g,
-        "iron_mg": recipe.iron_mg,
-        "calcium_mg": recipe.calcium_mg,
-        "vitamin_a_mcg": recipe.vitamin_a_mcg,
-        "vitamin_c_mg": recipe.vitamin_c_mg,
-        "vitamin_d_mcg": recipe.vitamin_d_mcg,
-        "meal_type": recipe.meal_type,
-        "cuisine": recipe.cuisine,
-        "tags": recipe.tags,
-        "allergens": recipe.allergens,
-        "serving_size_g": recipe.serving_size_g,
-        "nutrition_score": recipe.get_nutrition_score()
-    }
     
     return RecipeAdaptationResponse(
-        original_recipe=original_recipe_dict,
+        original_recipe=recipe.to_response_dict(),
         modified_ingredients=adapted.get('modified_ingredients', []),
         modified_instructions=adapted.get('modified_instructions', ''),
         nutritional_impact=adapted.get('nutritional_impact', ''),
@@ -895,15 +984,13 @@ def adapt_recipe(
 # ============================================================================
 
 @router.get("/status")
-def get_ai_status(db: Session = Depends(get_db)):
+def get_ai_status():
     """
     Check status of AI features.
     
     Returns:
         Status of smart features and available endpoints
     """
-    from app.core.config import settings
-    
     status_info = {
         "smart_features_available": SMART_FEATURES_AVAILABLE,
         "openai_api_key_configured": bool(settings.OPENAI_API_KEY),
@@ -918,6 +1005,7 @@ def get_ai_status(db: Session = Depends(get_db)):
                 "POST /recommendations/alternatives",
                 "POST /recommendations/retry-strategy",
                 "POST /recommendations/chat",
+                "POST /recommendations/chat/stream",
                 "POST /recommendations/weekly-plan",
                 "GET /recommendations/nutrition-analysis/{baby_id}",
                 "POST /recommendations/adapt-recipe"
@@ -2,13 +2,20 @@
 Authentication utilities - JWT tokens and password hashing
 """
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import FrozenSet, Optional
+import hashlib
+import time
 import bcrypt
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import get_db
+from app.models.baby import Baby
 from app.models.user import User
 
 # Configuration
@@ -18,21 +25,89 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token", auto_error=False)
 
+# Per-process caches so warm requests skip jwt.decode and the user SELECT
+_token_claims_cache = TTLCache(maxsize=4096, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+_user_cache = TTLCache(maxsize=4096, ttl=settings.AUTH_CACHE_TTL_SECONDS)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# Negative cache of login emails with no account (keys are SHA-256 hashes),
+# so repeated probes of the same unknown email skip the DB and bcrypt
+_unknown_email_cache = TTLCache(maxsize=10000, ttl=settings.AUTH_UNKNOWN_EMAIL_TTL_SECONDS)
+
+# Ids of the babies each user owns, for ownership checks that need nothing else
+_owned_baby_ids_cache = TTLCache(maxsize=4096, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+# User columns kept in the cache (the password hash is never cached)
+_CACHED_USER_FIELDS = ("id", "email", "phone", "is_active", "is_superuser", "created_at", "updated_at")
+
+
+def verify_password(plain_password: str, hashed_password: bytes) -> bool:
     """Verify a password against its hash"""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password)
+
+
+def get_password_hash(password: str) -> bytes:
+    """Hash a password (bcrypt's 60-byte hash, stored as-is)"""
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt)
+
+
+@lru_cache(maxsize=1)
+def get_dummy_password_hash() -> bytes:
+    """
+    Hash checked when no user matches a login email, so unknown and known
+    emails take the same time to reject (prevents user enumeration).
+    """
+    return get_password_hash("dummy-password-for-timing")
+
+
+@lru_cache(maxsize=1)
+def _password_check_seconds() -> float:
+    """Measured duration of one bcrypt verification on this machine"""
+    dummy_hash = get_dummy_password_hash()
+    start = time.perf_counter()
+    verify_password("dummy-password-for-timing", dummy_hash)
+    return time.perf_counter() - start
 
 
-def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+def _email_cache_key(email: str) -> str:
+    """Hash the email so cache keys don't hold personal data"""
+    return hashlib.sha256(email.lower().encode('utf-8')).hexdigest()
+
+
+def forget_unknown_email(email: str) -> None:
+    """Clear the negative-cache entry for an email (call once it is registered)"""
+    _unknown_email_cache.pop(_email_cache_key(email))
+
+
+def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    """
+    Return the user matching email and password, or None.
+    
+    Rejections take about one bcrypt check whether or not the email
+    exists. Emails recently found to have no account are rejected from
+    the negative cache by sleeping for that long instead, which holds no
+    CPU and issues no query.
+    """
+    email_key = _email_cache_key(email)
+    if email_key in _unknown_email_cache:
+        time.sleep(_password_check_seconds())
+        return None
+    
+    # Case-insensitive, served by ix_users_email_lower (the negative cache
+    # is keyed on the lower-cased email too)
+    user = db.query(User).filter(func.lower(User.email) == email.lower()).first()
+    if user is None:
+        _unknown_email_cache.set(email_key, True)
+    
+    # Always run bcrypt so unknown emails aren't faster
+    password_ok = verify_password(
+        password,
+        user.hashed_password if user else get_dummy_password_hash()
+    )
+    
+    return user if user is not None and password_ok else None
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -52,20 +127,84 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def _token_cache_key(token: str) -> str:
+    """Hash the raw token so cache keys don't hold credentials"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode JWT access token"""
+    """Decode JWT access token (claims are cached until token expiry)"""
+    cache_key = _token_cache_key(token)
+    payload = _token_claims_cache.get(cache_key)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    
+    # Never reuse claims beyond the token's own expiry
+    ttl = settings.AUTH_CACHE_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    _token_claims_cache.set(cache_key, payload, ttl=ttl)
+    
+    return payload
+
+
+def cache_user(user: User) -> None:
+    """
+    Store a snapshot of the user's profile columns in the auth cache
+
+    The snapshot is a transient User (never attached to a session) that is
+    built once and shared read-only by every request until it expires.
+    """
+    _user_cache.set(user.id, User(**{field: getattr(user, field) for field in _CACHED_USER_FIELDS}))
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop a user's cached profile (call after changing the user row)"""
+    _user_cache.pop(user_id)
+
+
+def forget_token(token: str) -> None:
+    """Drop a token's cached claims"""
+    _token_claims_cache.pop(_token_cache_key(token))
+
+
+def user_owns_baby(db: Session, user_id: int, baby_id: int) -> bool:
+    """
+    Check baby ownership against the user's cached baby ids
+
+    A miss reloads the ids before answering, so a baby created by another
+    worker is never rejected; removals are picked up on reload or expiry.
+    """
+    owned: Optional[FrozenSet[int]] = _owned_baby_ids_cache.get(user_id)
+    if owned is not None and baby_id in owned:
+        return True
+
+    owned = frozenset(db.scalars(select(Baby.id).where(Baby.user_id == user_id)))
+    _owned_baby_ids_cache.set(user_id, owned)
+    return baby_id in owned
+
+
+def invalidate_owned_babies(user_id: int) -> None:
+    """Drop a user's cached baby ids (call after creating or deleting a baby)"""
+    _owned_baby_ids_cache.pop(user_id)
 
 
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
-    """Get current authenticated user from JWT token"""
+    """
+    Get current authenticated user from JWT token
+    
+    On a cache hit this returns the shared, detached User snapshot built
+    from the cached profile columns: treat it as read-only and do not use
+    relationships (e.g. user.babies).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -88,10 +227,13 @@ def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    # Get user from cache, falling back to the database
+    user = _user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            raise credentials_exception
+        cache_user(user)
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
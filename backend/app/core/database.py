@@ -1,7 +1,9 @@
 """
 Database configuration and session management.
 """
-from sqlalchemy import create_engine
+import orjson
+from fastapi import Depends
+from sqlalchemy import create_engine, insert, update
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from typing import Generator
@@ -12,7 +14,16 @@ from app.core.config import settings
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,  # Verify connections before using
-    echo=settings.DEBUG  # Log SQL queries in debug mode
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    echo=settings.DB_ECHO,  # Statement logging goes through Python logging on every query
+    # JSON/JSONB columns (ingredients, tags, allergens, ...) are encoded and
+    # decoded with orjson; the driver expects str, orjson.dumps returns bytes
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads
 )
 
 # Create SessionLocal class
@@ -33,6 +44,12 @@ def get_db() -> Generator:
 
     Yields:
         Database session that is automatically closed after use.
+
+    Each request gets its own session rather than a thread-local
+    scoped_session: FastAPI may run the dependency and the endpoint on
+    different threadpool threads, so a thread-local session could be
+    shared between concurrent requests. Closing the session returns its
+    connection to the pool as soon as the request finishes.
     """
     db = SessionLocal()
     try:
@@ -41,17 +58,80 @@ def get_db() -> Generator:
         db.close()
 
 
+def get_read_db(db=Depends(get_db)) -> Generator:
+    """
+    Dependency for read-only endpoints: the request's session with its
+    transaction opened as READ ONLY on PostgreSQL.
+
+    Builds on get_db, so other dependencies in the same request (e.g.
+    get_current_user) share the session. Declare it before them in the
+    endpoint signature so the option is applied before the first query.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # psycopg2 folds this into the BEGIN (BEGIN READ ONLY); no extra round trip
+        db.connection(execution_options={"postgresql_readonly": True})
+    yield db
+
+
 def init_db() -> None:
     """
     Initialize database by creating all tables.
     Should be called on application startup.
     """
     # Import all models here to ensure they are registered with Base
-    from app.models import baby, recipe, feedback
+    from app.models import baby, recipe, recipe_ingredient, feedback
 
     Base.metadata.create_all(bind=engine)
     print("Database tables created successfully")
 
+    _backfill_nutrition_scores()
+    _backfill_recipe_ingredients()
+
+
+def _backfill_nutrition_scores() -> None:
+    """Populate the stored nutrition score for recipes saved before it existed."""
+    from app.models.recipe import Recipe
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Recipe.id, Recipe.protein_g, Recipe.fiber_g, Recipe.iron_mg,
+            Recipe.calcium_mg, Recipe.vitamin_a_mcg, Recipe.sugar_g
+        ).filter(Recipe.nutrition_score.is_(None)).all()
+        if rows:
+            ids, *nutrients = zip(*rows)
+            scores = Recipe.batch_nutrition_scores(*nutrients)
+            # One executemany UPDATE by primary key
+            db.execute(update(Recipe), [
+                {"id": recipe_id, "nutrition_score": score}
+                for recipe_id, score in zip(ids, scores.tolist())
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _backfill_recipe_ingredients() -> None:
+    """Populate recipe_ingredients for recipes saved before the table existed."""
+    from app.models.recipe import Recipe, ingredient_name_set
+    from app.models.recipe_ingredient import RecipeIngredient
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Recipe.id, Recipe.ingredients).filter(
+            ~Recipe.ingredient_rows.any()
+        ).all()
+        values = [
+            {"recipe_id": recipe_id, "name": name}
+            for recipe_id, ingredients in rows
+            for name in sorted(ingredient_name_set(ingredients))
+        ]
+        if values:
+            db.execute(insert(RecipeIngredient), values)
+        db.commit()
+    finally:
+        db.close()
+
 
 def drop_all_tables() -> None:
     """
@@ -1,21 +1,69 @@
 """
 FastAPI application entry point.
 """
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import engine, init_db
 from app.api.routes import auth, babies, recipes, recommendations
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Size the threadpool and warm the connection pool before serving; close LLM clients on shutdown."""
+    # Sync endpoints run in anyio's threadpool (40 threads by default);
+    # size it so blocking DB waits don't queue requests behind each other
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    # Schema is managed outside the app in production; create_all on every
+    # worker start only races and probes the catalog
+    if settings.DEBUG:
+        init_db()
+    # Open the first pooled connection now rather than on the first request
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print(f"{settings.PROJECT_NAME} started successfully")
+    yield
+    # Release the shared OpenAI clients' pooled connections
+    if recommendations.SMART_FEATURES_AVAILABLE:
+        from app.services.llm_service import close_llm_service
+        await close_llm_service()
+
+
 # Create FastAPI application
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_PREFIX}/openapi.json"
+    openapi_url=f"{settings.API_PREFIX}/openapi.json",
+    # Render every JSON response with orjson (C) instead of the stdlib encoder
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip that passes server-sent event streams through uncompressed.
+
+    The compressor only emits bytes once its buffer fills, which would hold
+    back streamed tokens; SSE routes end in `/stream`.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress large JSON bodies (weekly plans, adapted recipes); small ones
+# aren't worth the CPU
+app.add_middleware(StreamAwareGZipMiddleware, minimum_size=1024)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,14 +74,6 @@ app.add_middleware(
 )
 
 
-# Initialize database on startup
-@app.on_event("startup")
-def startup_event():
-    """Initialize database tables on application startup."""
-    init_db()
-    print(f"{settings.PROJECT_NAME} started successfully")
-
-
 # Include routers
 app.include_router(
     auth.router,
@@ -4,6 +4,7 @@ Models package - exports all database models.
 from app.models.user import User
 from app.models.baby import Baby
 from app.models.recipe import Recipe
+from app.models.recipe_ingredient import RecipeIngredient
 from app.models.feedback import Feedback
 
-__all__ = ["User", "Baby", "Recipe", "Feedback"]
\ No newline at end of file
+__all__ = ["User", "Baby", "Recipe", "RecipeIngredient", "Feedback"]
\ No newline at end of file
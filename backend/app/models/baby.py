@@ -1,16 +1,26 @@
 """
 Baby model - Updated with user relationship
 """
-from sqlalchemy import Column, Integer, String, Float, Date, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, JSON, DateTime, ForeignKey, Index, event, func
 from sqlalchemy.orm import relationship
-from datetime import datetime, date
+from datetime import date
+from functools import cached_property
 from dateutil.relativedelta import relativedelta
 from app.core.database import Base
 
 
+# Developmental stage by half-year of age: <6, <12, <24 and 24+ months
+_AGE_STAGES = ("early_infancy", "late_infancy", "toddler", "toddler", "preschooler")
+
+
 class Baby(Base):
     """Baby profile model"""
     __tablename__ = "babies"
+    __table_args__ = (
+        # Supports keyset pagination of a user's babies (WHERE user_id = ? AND id > ?)
+        Index("ix_babies_user_id_id", "user_id", "id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -22,16 +32,17 @@ class Baby(Base):
     dietary_restrictions = Column(JSON, default=list)
     liked_ingredients = Column(JSON, default=list)
     disliked_ingredients = Column(JSON, default=list)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Stamped by the database; eager_defaults returns them from the INSERT/UPDATE
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
-    user = relationship("User", back_populates="babies")
-    feedbacks = relationship("Feedback", back_populates="baby", cascade="all, delete-orphan")
+    user = relationship("User", back_populates="babies", lazy="raise")
+    feedbacks = relationship("Feedback", back_populates="baby", cascade="all, delete-orphan", lazy="raise")
 
-    @property
+    @cached_property
     def age_months(self) -> int:
-        """Calculate baby's age in months"""
+        """Calculate baby's age in months (computed once per instance)"""
         today = date.today()
         delta = relativedelta(today, self.birth_date)
         return delta.years * 12 + delta.months
@@ -39,15 +50,34 @@ class Baby(Base):
     @property
     def age_stage(self) -> str:
         """Get baby's developmental stage"""
-        months = self.age_months
-        if months < 6:
-            return "early_infancy"
-        elif months < 12:
-            return "late_infancy"
-        elif months < 24:
-            return "toddler"
-        else:
-            return "preschooler"
+        return _AGE_STAGES[min(max(self.age_months, 0) // 6, len(_AGE_STAGES) - 1)]
+
+    @cached_property
+    def allergies_text(self) -> str:
+        """Allergies as prompt text ("None" when there are none)"""
+        return ', '.join(self.allergies) if self.allergies else 'None'
+
+    @cached_property
+    def liked_ingredients_text(self) -> str:
+        """Liked ingredients as prompt text (empty when there are none)"""
+        return ', '.join(self.liked_ingredients) if self.liked_ingredients else ''
+
+    @cached_property
+    def disliked_ingredients_lc(self) -> tuple:
+        """Disliked ingredients lower-cased, in order, for ingredient matching"""
+        return tuple(ingredient.lower() for ingredient in (self.disliked_ingredients or ()))
+
+    @cached_property
+    def profile_block(self) -> str:
+        """The "Baby Profile" lines shared by the LLM prompts"""
+        return (
+            f"Baby Profile:\n"
+            f"- Name: {self.name}\n"
+            f"- Age: {self.age_months} months ({self.age_stage} stage)\n"
+            f"- Weight: {self.weight_kg}kg\n"
+            f"- Allergies: {self.allergies_text}\n"
+            f"- Likes: {self.liked_ingredients_text or 'exploring new foods'}"
+        )
 
     @property
     def tried_ingredients(self) -> dict:
@@ -55,4 +85,34 @@ class Baby(Base):
         return {}
 
     def __repr__(self):
-        return f"<Baby {self.name}, {self.age_months} months>"
\ No newline at end of file
+        return f"<Baby {self.name}, {self.age_months} months>"
+
+
+# Per-instance values computed from columns, with the columns they read
+_CACHED_PROPERTIES = (
+    "age_months", "allergies_text", "liked_ingredients_text", "disliked_ingredients_lc", "profile_block"
+)
+_CACHE_SOURCE_COLUMNS = (
+    Baby.birth_date, Baby.name, Baby.weight_kg, Baby.allergies, Baby.liked_ingredients, Baby.disliked_ingredients
+)
+
+
+def _forget_cached_properties(target: Baby) -> None:
+    """Drop every cached value from the instance."""
+    for name in _CACHED_PROPERTIES:
+        target.__dict__.pop(name, None)
+
+
+def _forget_cached_on_set(target: Baby, value, oldvalue, initiator) -> None:
+    """Drop the cached values when a column they read is assigned on a loaded instance."""
+    _forget_cached_properties(target)
+
+
+for _column in _CACHE_SOURCE_COLUMNS:
+    event.listen(_column, "set", _forget_cached_on_set)
+
+
+@event.listens_for(Baby, "refresh")
+def _forget_cached_on_refresh(target: Baby, context, attrs) -> None:
+    """Drop the cached values when the row is reloaded (refresh, populate_existing)."""
+    _forget_cached_properties(target)
@@ -2,19 +2,42 @@
 Feedback model for tracking parental responses to recipe recommendations.
 This enables the reinforcement learning loop.
 """
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, Boolean
+from sqlalchemy import Column, Computed, Integer, String, Float, ForeignKey, Date, Boolean, Index, case, func, insert
 from sqlalchemy.orm import relationship
-from datetime import date
+from operator import attrgetter
+from typing import Dict, Iterable, List
 
 from app.core.database import Base
 
 
+# Stored attributes serialized into FeedbackResponse
+FEEDBACK_RESPONSE_FIELDS = (
+    "id", "baby_id", "recipe_id", "rating", "accepted", "prepared", "baby_liked",
+    "comments", "rejection_reason", "recommended_at", "feedback_at", "feedback_score",
+)
+_get_response_values = attrgetter(*FEEDBACK_RESPONSE_FIELDS)
+
+
 class Feedback(Base):
     """
     Stores parental feedback on recommended recipes.
     Used to improve future recommendations via reinforcement learning.
     """
     __tablename__ = "feedbacks"
+    __table_args__ = (
+        # Keyset pagination of a baby's feedbacks (WHERE baby_id = ? AND id < ?)
+        Index("ix_feedbacks_baby_id_id", "baby_id", "id"),
+        # A baby's "recently recommended" window
+        Index("ix_feedbacks_baby_id_recommended_at", "baby_id", "recommended_at"),
+        # Recipes prepared for a baby within a date window (nutrition analysis);
+        # recipe_id is included so the lookup is an index-only scan
+        Index("ix_feedbacks_baby_id_prepared_recommended_at", "baby_id", "prepared", "recommended_at", "recipe_id"),
+        # Per-recipe acceptance averages and rejection rates; rating rides
+        # along on PostgreSQL so both aggregates are index-only scans
+        Index("ix_feedbacks_recipe_id_accepted", "recipe_id", "accepted", postgresql_include=["rating"]),
+    )
+    # Fetch the generated feedback_score with INSERT/UPDATE ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -32,47 +55,79 @@ class Feedback(Base):
     comments = Column(String)  # Optional text feedback
     rejection_reason = Column(String)  # Why was it rejected? (if applicable)
 
-    # Metadata
-    recommended_at = Column(Date, default=date.today)
-    feedback_at = Column(Date, default=date.today)
+    # Metadata (dated by the database, so bulk inserts send no date parameters)
+    recommended_at = Column(Date, server_default=func.current_date(), nullable=False)
+    feedback_at = Column(Date, server_default=func.current_date(), nullable=False)
+
+    # Composite feedback score (0-1) used for training the recommendation
+    # model, generated and stored by the database on every write:
+    # - If rejected: 0.0
+    # - If accepted but not prepared: 0.3
+    # - If prepared but baby didn't like: 0.4
+    # - If prepared and baby liked (or no info): rating/5.0
+    feedback_score = Column(Float, Computed(case(
+        (func.coalesce(accepted, False) == False, 0.0),
+        (func.coalesce(prepared, False) == False, 0.3),
+        (baby_liked == False, 0.4),
+        else_=rating / 5.0,
+    ), persisted=True))
 
     # Relationships
-    baby = relationship("Baby", back_populates="feedbacks")
-    recipe = relationship("Recipe", back_populates="feedbacks")
+    baby = relationship("Baby", back_populates="feedbacks", lazy="raise")
+    recipe = relationship("Recipe", back_populates="feedbacks", lazy="raise")
 
-    def get_feedback_score(self) -> float:
-        """
-        Calculate a composite feedback score (0-1).
-        Used for training the recommendation model.
-
-        Scoring logic:
-        - If rejected: 0.0
-        - If accepted but not prepared: 0.3
-        - If prepared but baby didn't like: 0.4
-        - If prepared and baby liked: rating/5.0
-        """
-        if not self.accepted:
-            return 0.0
+    def to_response_dict(self) -> dict:
+        """Return the feedback's response fields as a dict (one attrgetter call)."""
+        return dict(zip(FEEDBACK_RESPONSE_FIELDS, _get_response_values(self)))
 
-        if not self.prepared:
-            return 0.3
-
-        if self.baby_liked is False:
-            return 0.4
+    @classmethod
+    def bulk_insert(cls, session, rows: List[dict]) -> List["Feedback"]:
+        """
+        Insert many feedbacks in one executemany INSERT ... RETURNING.
 
-        # Baby liked it or no info - use rating
-        return self.rating / 5.0
+        SQLAlchemy batches the rows into multi-VALUES statements
+        (insertmanyvalues); the returned Feedbacks are in the order of `rows`,
+        with server defaults and feedback_score populated.
+        """
+        if not rows:
+            return []
+        return session.scalars(
+            insert(cls).returning(cls, sort_by_parameter_order=True),
+            rows
+        ).all()
 
     @classmethod
     def get_rejection_rate_for_recipe(cls, session, recipe_id: int) -> float:
         """Calculate rejection rate for a specific recipe."""
-        total = session.query(cls).filter(cls.recipe_id == recipe_id).count()
+        total, rejected = session.query(
+            func.count(),
+            func.sum(case((cls.accepted == False, 1), else_=0))
+        ).filter(cls.recipe_id == recipe_id).one()
+
         if total == 0:
             return 0.0
 
-        rejected = session.query(cls).filter(
-            cls.recipe_id == recipe_id,
-            cls.accepted == False
-        ).count()
+        return rejected / total
+
+    @classmethod
+    def get_rejection_rates(cls, session, recipe_ids: Iterable[int]) -> Dict[int, float]:
+        """
+        Rejection rate for each of recipe_ids, in one grouped query.
+
+        Recipes without feedback get 0.0.
+        """
+        recipe_ids = list(recipe_ids)
+        rates = dict.fromkeys(recipe_ids, 0.0)
+        if not recipe_ids:
+            return rates
+
+        rows = session.query(
+            cls.recipe_id,
+            func.count(),
+            func.sum(case((cls.accepted == False, 1), else_=0))
+        ).filter(cls.recipe_id.in_(recipe_ids)).group_by(cls.recipe_id)
+
+        for recipe_id, total, rejected in rows:
+            rates[recipe_id] = rejected / total
 
-        return rejected / total
\ No newline at end of file
+        return rates
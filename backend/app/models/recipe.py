@@ -1,10 +1,36 @@
 """
 Recipe model for storing meal information and nutritional data.
 """
-from sqlalchemy import Column, Integer, String, Float, Text, JSON, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Text, JSON, DateTime, ForeignKey, Index, bindparam, event, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import aliased, relationship
+from functools import cached_property
+from operator import attrgetter
+
+import numpy as np
 
 from app.core.database import Base
+from app.models.recipe_ingredient import RecipeIngredient
+
+
+# Attributes serialized into recipe API responses (RecipeResponse fields)
+RECIPE_RESPONSE_FIELDS = (
+    "id", "name", "description", "age_min_months", "age_max_months",
+    "preparation_time_min", "difficulty_level", "ingredients", "instructions",
+    "calories", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g",
+    "iron_mg", "calcium_mg", "vitamin_a_mcg", "vitamin_c_mg", "vitamin_d_mcg",
+    "meal_type", "cuisine", "tags", "allergens", "serving_size_g", "nutrition_score",
+)
+_get_response_values = attrgetter(*RECIPE_RESPONSE_FIELDS)
+
+# JSON documents are stored as JSONB on Postgres (binary, indexable,
+# containment operators); other dialects keep plain JSON
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+def ingredient_name_set(ingredients) -> frozenset:
+    """Distinct lower-cased, non-empty names from a Recipe.ingredients list."""
+    return frozenset(ing.get('name', '').lower() for ing in (ingredients or ())) - {""}
 
 
 class Recipe(Base):
@@ -12,6 +38,16 @@ class Recipe(Base):
     Represents a baby meal recipe with nutritional information.
     """
     __tablename__ = "recipes"
+    __table_args__ = (
+        # Tag containment filter (tags @> '["..."]') is served by a GIN index
+        Index("ix_recipes_tags_gin", "tags", postgresql_using="gin"),
+        # Allergen exclusion (NOT allergens ?| array[...]), see excludes_allergens()
+        Index("ix_recipes_allergens_gin", "allergens", postgresql_using="gin"),
+        Index("ix_recipes_age_range", "age_min_months", "age_max_months"),
+        # meal_type equality first, then the age range (also serves meal_type alone)
+        Index("ix_recipes_meal_type_age", "meal_type", "age_min_months", "age_max_months"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -24,7 +60,7 @@ class Recipe(Base):
     difficulty_level = Column(String)  # easy, medium, hard
 
     # Ingredients and instructions
-    ingredients = Column(JSON, nullable=False)  # List of ingredients with quantities
+    ingredients = Column(JSONDocument, nullable=False)  # List of ingredients with quantities
     instructions = Column(Text)
 
     # Nutritional information (per 100g)
@@ -45,14 +81,39 @@ class Recipe(Base):
     # Categories and tags
     meal_type = Column(String)  # breakfast, lunch, dinner, snack
     cuisine = Column(String)  # e.g., "Asian", "Mediterranean"
-    tags = Column(JSON, default=list)  # e.g., ["vegetarian", "high_protein", "iron_rich"]
-    allergens = Column(JSON, default=list)  # e.g., ["dairy", "eggs", "nuts"]
+    tags = Column(JSONDocument, default=list)  # e.g., ["vegetarian", "high_protein", "iron_rich"]
+    allergens = Column(JSONDocument, default=list)  # e.g., ["dairy", "eggs", "nuts"]
 
     # Metadata
     serving_size_g = Column(Float, default=100.0)  # Default serving size
+    # Stamped by the database; eager_defaults returns them from the INSERT/UPDATE
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Derived data (kept in sync by the before_insert/before_update hooks below)
+    nutrition_score = Column(Float)  # Cached result of get_nutrition_score()
 
     # Relationships
-    feedbacks = relationship("Feedback", back_populates="recipe", cascade="all, delete-orphan")
+    feedbacks = relationship("Feedback", back_populates="recipe", cascade="all, delete-orphan", lazy="raise")
+    # Ingredient names from `ingredients`, rebuilt whenever it is assigned
+    ingredient_rows = relationship(RecipeIngredient, cascade="all, delete-orphan")
+
+    def to_response_dict(self) -> dict:
+        """Return the recipe's response fields as a dict (one attrgetter call)."""
+        return dict(zip(RECIPE_RESPONSE_FIELDS, _get_response_values(self)))
+
+    @classmethod
+    def suitable_for_age_query(cls, session, age_months: int):
+        """
+        Query for recipes suitable for the given age (is_suitable_for_age in SQL).
+
+        A range scan on ix_recipes_age_range; chain with_entities() to fetch
+        only the needed columns.
+        """
+        return session.query(cls).filter(
+            cls.age_min_months <= age_months,
+            or_(cls.age_max_months.is_(None), cls.age_max_months >= age_months)
+        )
 
     def is_suitable_for_age(self, age_months: int) -> bool:
         """Check if recipe is suitable for given age."""
@@ -62,11 +123,61 @@ class Recipe(Base):
             return False
         return True
 
+    @cached_property
+    def _allergen_set(self) -> frozenset:
+        """The recipe's allergens as a set (built once per instance)."""
+        return frozenset(self.allergens or ())
+
+    @cached_property
+    def ingredient_names(self) -> tuple:
+        """Names from `ingredients`, in recipe order (built once per instance)."""
+        return tuple(ing['name'] for ing in (self.ingredients or ()))
+
+    @cached_property
+    def ingredient_names_lc(self) -> frozenset:
+        """ingredient_name_set of `ingredients` (built once per instance)."""
+        return ingredient_name_set(self.ingredients)
+
+    @cached_property
+    def ingredients_csv(self) -> str:
+        """ingredient_names joined for prompts, e.g. "banana, oats"."""
+        return ', '.join(self.ingredient_names)
+
     def has_allergen(self, allergen_list: list) -> bool:
         """Check if recipe contains any allergens from the list."""
-        if not self.allergens or not allergen_list:
+        if not allergen_list:
             return False
-        return any(allergen in self.allergens for allergen in allergen_list)
+        return not self._allergen_set.isdisjoint(allergen_list)
+
+    @classmethod
+    def excludes_allergens(cls, allergen_list: list):
+        """
+        SQL filter matching recipes that list none of the allergens (PostgreSQL).
+
+        Written as an anti-join against the recipes that do match, since the
+        GIN index (ix_recipes_allergens_gin) can serve `allergens ?| array`
+        but not its negation. Recipes with no allergens recorded match.
+        """
+        listed = aliased(cls)
+        return cls.id.not_in(
+            select(listed.id).where(
+                listed.allergens.op("?|")(bindparam("allergens", list(allergen_list), type_=ARRAY(Text)))
+            )
+        )
+
+    @classmethod
+    def contains_ingredient(cls, *ingredients: str):
+        """
+        SQL filter matching recipes with an ingredient whose name contains
+        any of `ingredients` (case-insensitive), via the recipe_ingredients
+        table, in one subquery.
+        """
+        return cls.id.in_(
+            select(RecipeIngredient.recipe_id).where(or_(*(
+                RecipeIngredient.name.contains(ingredient.lower(), autoescape=True)
+                for ingredient in ingredients
+            )))
+        )
 
     def get_nutrition_score(self) -> float:
         """
@@ -97,4 +208,62 @@ class Recipe(Base):
             score -= min(self.sugar_g, 20)
 
         # Clamp between 0 and 100
-        return max(0, min(score, 100))
\ No newline at end of file
+        return max(0, min(score, 100))
+
+    @staticmethod
+    def batch_nutrition_scores(protein, fiber, iron, calcium, vitamin_a, sugar) -> np.ndarray:
+        """
+        get_nutrition_score for many recipes at once.
+
+        Takes one sequence per nutrient, aligned by recipe; missing values
+        (None/NaN) count as zero, like the falsy checks above.
+        """
+        protein, fiber, iron, calcium, vitamin_a, sugar = (
+            np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+            for values in (protein, fiber, iron, calcium, vitamin_a, sugar)
+        )
+        score = (
+            50.0
+            + np.minimum(protein * 2, 20)
+            + np.minimum(fiber * 3, 10)
+            + np.minimum(iron, 5)
+            + np.minimum(calcium / 20, 5)
+            + np.minimum(vitamin_a / 50, 5)
+            - np.minimum(sugar, 20)
+        )
+        return np.clip(score, 0, 100)
+
+
+@event.listens_for(Recipe, "before_insert")
+@event.listens_for(Recipe, "before_update")
+def _store_nutrition_score(mapper, connection, target: Recipe) -> None:
+    """Recompute the stored nutrition score whenever a recipe is written."""
+    target.nutrition_score = target.get_nutrition_score()
+
+
+@event.listens_for(Recipe.ingredients, "set")
+def _sync_ingredient_rows(target: Recipe, value, oldvalue, initiator) -> None:
+    """Rebuild recipe_ingredients rows from a newly assigned ingredients list."""
+    names = ingredient_name_set(value)
+    existing = {row.name: row for row in target.ingredient_rows}
+    target.ingredient_rows = [existing.get(name) or RecipeIngredient(name=name) for name in sorted(names)]
+
+
+@event.listens_for(Recipe.allergens, "set")
+def _forget_allergen_set(target: Recipe, value, oldvalue, initiator) -> None:
+    """Drop the cached allergen set when allergens change on a loaded instance."""
+    target.__dict__.pop("_allergen_set", None)
+
+
+@event.listens_for(Recipe.ingredients, "set")
+def _forget_ingredient_names(target: Recipe, value, oldvalue, initiator) -> None:
+    """Drop the cached ingredient names when ingredients change on a loaded instance."""
+    for name in ("ingredient_names", "ingredient_names_lc", "ingredients_csv"):
+        target.__dict__.pop(name, None)
+
+
+@event.listens_for(Recipe, "refresh")
+def _forget_cached_on_refresh(target: Recipe, context, attrs) -> None:
+    """Drop the cached derived values when the row is reloaded (refresh, populate_existing)."""
+    for name in ("_allergen_set", "ingredient_names", "ingredient_names_lc", "ingredients_csv"):
+        target.__dict__.pop(name, None)
@@ -0,0 +1,25 @@
+"""
+RecipeIngredient model: one row per distinct ingredient name in a recipe.
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+
+from app.core.database import Base
+
+
+class RecipeIngredient(Base):
+    """
+    Normalized copy of the ingredient names in Recipe.ingredients.
+
+    Maintained from the JSON column (see Recipe), so "which recipes contain
+    X?" is answered by a subquery on this table instead of loading every
+    recipe and scanning its ingredient list in Python.
+    """
+    __tablename__ = "recipe_ingredients"
+    __table_args__ = (
+        # Exact-name lookups; substring matches (LIKE '%x%') can't seek it and
+        # scan the table instead
+        Index("ix_recipe_ingredients_name_recipe", "name", "recipe_id"),
+    )
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String, primary_key=True)  # Lowercased ingredient name
@@ -1,27 +1,34 @@
 """
 User model for authentication and baby ownership
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, LargeBinary, func
 from sqlalchemy.orm import relationship
-from datetime import datetime
 from app.core.database import Base
 
 
 class User(Base):
     """User model for authentication"""
     __tablename__ = "users"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
+    hashed_password = Column(LargeBinary(60), nullable=False)  # Raw bcrypt hash bytes
     phone = Column(String, nullable=True)  # Optional for future SMS feature
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Stamped by the database; eager_defaults returns them from the INSERT/UPDATE
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
-    babies = relationship("Baby", back_populates="user", cascade="all, delete-orphan")
+    babies = relationship("Baby", back_populates="user", cascade="all, delete-orphan", lazy="raise")
+
+    __table_args__ = (
+        # Case-insensitive login lookup (lower(email) = ?), and no two
+        # accounts whose emails differ only in case
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
 
     def __repr__(self):
         return f"<User {self.email}>"
\ No newline at end of file
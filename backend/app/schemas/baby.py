@@ -1,7 +1,7 @@
 """
 Pydantic schemas for Baby API requests and responses.
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date, datetime
 from typing import Optional
 
@@ -40,12 +40,18 @@ class BabyResponse(BabyBase):
     age_months: int  # Computed field
     age_stage: str  # Computed field
 
-    class Config:
-        from_attributes = True  # Enable ORM mode for SQLAlchemy models
+    model_config = ConfigDict(from_attributes=True)  # Enable ORM mode for SQLAlchemy models
 
 
 class BabyWithStats(BabyResponse):
     """Extended baby response with statistics."""
     total_feedbacks: int = 0
     average_rating: float = 0.0
-    acceptance_rate: float = 0.0
\ No newline at end of file
+    acceptance_rate: float = 0.0
+
+
+class BabyPage(BaseModel):
+    """Keyset-paginated list of baby profiles."""
+    items: list[BabyResponse]
+    has_next: bool = False
+    next_after_id: Optional[int] = None  # Pass as after_id to fetch the next page
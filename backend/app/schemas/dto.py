@@ -0,0 +1,57 @@
+"""
+Lightweight data-transfer objects used inside services.
+
+Slotted dataclasses carry query rows through the service layer without
+ORM instance state or a per-instance __dict__; Pydantic response models
+are only built from them at the API boundary.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Dict, List, Optional
+
+from app.models.recipe import RECIPE_RESPONSE_FIELDS, ingredient_name_set
+
+_get_recipe_response_values = attrgetter(*RECIPE_RESPONSE_FIELDS)
+
+
+@dataclass(slots=True)
+class RecipeDTO:
+    """A recipes row; exposes the same attributes as Recipe."""
+    id: int
+    name: str
+    description: Optional[str]
+    age_min_months: int
+    age_max_months: Optional[int]
+    preparation_time_min: Optional[int]
+    difficulty_level: Optional[str]
+    ingredients: List[Dict[str, Any]]
+    instructions: Optional[str]
+    calories: Optional[float]
+    protein_g: Optional[float]
+    carbs_g: Optional[float]
+    fat_g: Optional[float]
+    fiber_g: Optional[float]
+    sugar_g: Optional[float]
+    iron_mg: Optional[float]
+    calcium_mg: Optional[float]
+    vitamin_a_mcg: Optional[float]
+    vitamin_c_mg: Optional[float]
+    vitamin_d_mcg: Optional[float]
+    meal_type: Optional[str]
+    cuisine: Optional[str]
+    tags: Optional[List[str]]
+    allergens: Optional[List[str]]
+    serving_size_g: Optional[float]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    nutrition_score: Optional[float]
+    # Derived once per DTO, which the recipe corpus shares across requests
+    ingredient_names_lc: frozenset = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.ingredient_names_lc = ingredient_name_set(self.ingredients)
+
+    def to_response_dict(self) -> dict:
+        """Return the recipe's response fields as a dict (one attrgetter call)."""
+        return dict(zip(RECIPE_RESPONSE_FIELDS, _get_recipe_response_values(self)))
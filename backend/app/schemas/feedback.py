@@ -1,10 +1,12 @@
 """
 Pydantic schemas for Feedback API requests and responses.
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date
 from typing import Optional
 
+from app.schemas.recipe import MealType
+
 
 class FeedbackBase(BaseModel):
     """Base schema with common feedback attributes."""
@@ -41,13 +43,19 @@ class FeedbackResponse(FeedbackBase):
     feedback_at: date
     feedback_score: float  # Computed field
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class FeedbackPage(BaseModel):
+    """Keyset-paginated list of feedbacks, newest first."""
+    items: list[FeedbackResponse]
+    has_next: bool = False
+    next_before_id: Optional[int] = None  # Pass as before_id to fetch the next page
 
 
 class RecommendationRequest(BaseModel):
     """Schema for requesting recipe recommendations."""
     baby_id: int = Field(..., gt=0)
     count: int = Field(default=5, ge=1, le=20)
-    meal_type: Optional[str] = None
+    meal_type: Optional[MealType] = None
     exclude_recently_recommended: bool = True
\ No newline at end of file
@@ -1,8 +1,11 @@
 """
 Pydantic schemas for Recipe API requests and responses.
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Literal, Optional
+
+DifficultyLevel = Literal["easy", "medium", "hard"]
+MealType = Literal["breakfast", "lunch", "dinner", "snack"]
 
 
 class RecipeBase(BaseModel):
@@ -12,7 +15,7 @@ class RecipeBase(BaseModel):
     age_min_months: int = Field(..., ge=4, le=36)
     age_max_months: Optional[int] = Field(None, ge=4, le=36)
     preparation_time_min: Optional[int] = Field(None, ge=1, le=300)
-    difficulty_level: Optional[str] = Field(None, pattern="^(easy|medium|hard)$")
+    difficulty_level: Optional[DifficultyLevel] = None
 
     ingredients: list[dict] = Field(..., min_length=1)
     instructions: Optional[str] = None
@@ -33,7 +36,7 @@ class RecipeBase(BaseModel):
     vitamin_d_mcg: Optional[float] = Field(None, ge=0)
 
     # Categories
-    meal_type: Optional[str] = None
+    meal_type: Optional[MealType] = None
     cuisine: Optional[str] = None
     tags: list[str] = Field(default_factory=list)
     allergens: list[str] = Field(default_factory=list)
@@ -52,7 +55,7 @@ class RecipeUpdate(BaseModel):
     age_min_months: Optional[int] = Field(None, ge=4, le=36)
     age_max_months: Optional[int] = Field(None, ge=4, le=36)
     preparation_time_min: Optional[int] = Field(None, ge=1, le=300)
-    difficulty_level: Optional[str] = Field(None, pattern="^(easy|medium|hard)$")
+    difficulty_level: Optional[DifficultyLevel] = None
     ingredients: Optional[list[dict]] = None
     instructions: Optional[str] = None
     calories: Optional[float] = Field(None, ge=0)
@@ -66,7 +69,7 @@ class RecipeUpdate(BaseModel):
     vitamin_a_mcg: Optional[float] = Field(None, ge=0)
     vitamin_c_mg: Optional[float] = Field(None, ge=0)
     vitamin_d_mcg: Optional[float] = Field(None, ge=0)
-    meal_type: Optional[str] = None
+    meal_type: Optional[MealType] = None
     cuisine: Optional[str] = None
     tags: Optional[list[str]] = None
     allergens: Optional[list[str]] = None
@@ -76,10 +79,16 @@ class RecipeUpdate(BaseModel):
 class RecipeResponse(RecipeBase):
     """Schema for recipe response."""
     id: int
-    nutrition_score: float  # Computed field
+    nutrition_score: float  # Stored on write from Recipe.get_nutrition_score()
+
+    model_config = ConfigDict(from_attributes=True)
+
 
-    class Config:
-        from_attributes = True
+class RecipePage(BaseModel):
+    """Keyset-paginated list of recipes."""
+    items: list[RecipeResponse]
+    has_next: bool = False
+    next_after_id: Optional[int] = None  # Pass as after_id to fetch the next page
 
 
 class RecipeWithScore(RecipeResponse):
@@ -2,7 +2,7 @@
 Pydantic schemas for AI-enhanced recommendation features.
 """
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Literal, Optional, Any
 from datetime import date
 
 from app.schemas.recipe import RecipeResponse
@@ -70,7 +70,7 @@ class SmartRecommendationResponse(BaseModel):
 
 class ChatMessage(BaseModel):
     """Chat message for conversational interface."""
-    role: str = Field(..., pattern="^(user|assistant|system)$")
+    role: Literal["user", "assistant", "system"]
     content: str
 
 
@@ -100,15 +100,52 @@ class RetryStrategyRequest(BaseModel):
     ingredient: str
 
 
+class DailyMealPlan(BaseModel):
+    """One day of a meal plan: meal slot -> meal name."""
+    breakfast: str
+    lunch: str
+    dinner: str
+    snack1: str
+    snack2: str
+
+
 class WeeklyMealPlan(BaseModel):
-    """Weekly meal plan structure."""
-    monday: Dict[str, str]
-    tuesday: Dict[str, str]
-    wednesday: Dict[str, str]
-    thursday: Dict[str, str]
-    friday: Dict[str, str]
-    saturday: Dict[str, str]
-    sunday: Dict[str, str]
+    """
+    Weekly meal plan structure: day -> meal slot -> meal name.
+
+    Fixed fields rather than a dict, so it can be sent to the LLM as a
+    strict tool schema; serializes to the same JSON object
+    (`{"monday": {"breakfast": ...}, ...}`) as the generated plan.
+    """
+    monday: DailyMealPlan
+    tuesday: DailyMealPlan
+    wednesday: DailyMealPlan
+    thursday: DailyMealPlan
+    friday: DailyMealPlan
+    saturday: DailyMealPlan
+    sunday: DailyMealPlan
+
+
+class RetryStrategyAdvice(BaseModel):
+    """LLM-generated advice for retrying a disliked ingredient."""
+    strategy: str
+    rationale: str
+    specific_suggestion: str
+
+
+class AdaptedIngredient(BaseModel):
+    """Ingredient line of an adapted recipe (same keys as Recipe.ingredients)."""
+    name: str
+    quantity: str
+    unit: str
+
+
+class AdaptedRecipe(BaseModel):
+    """LLM-generated recipe adaptation."""
+    modified_ingredients: List[AdaptedIngredient]
+    modified_instructions: str
+    nutritional_impact: str
+    safety_notes: str
 
 
 class WeeklyPlanRequest(BaseModel):
@@ -0,0 +1,96 @@
+"""
+OpenAI Batch API jobs for LLM work nobody is waiting on.
+
+Nightly meal-plan generation for many babies doesn't need an answer
+within the request; the Batch API runs the same completions at half the
+price, from a separate rate-limit pool, within 24 hours. On-demand
+generation keeps using LLMService directly.
+"""
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.models.baby import Baby
+from app.services.llm_service import LLMService, _json_message_text
+
+# Batch statuses after which the batch will not change any more
+_FINISHED_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class LLMBatchService:
+    """Submits LLMService prompts as Batch API jobs and collects the results."""
+
+    def __init__(self, llm_service: LLMService):
+        self.llm_service = llm_service
+        self.client = llm_service.client
+
+    def submit_weekly_plans(
+        self,
+        babies: List[Baby],
+        preferences: Optional[Dict] = None
+    ) -> str:
+        """
+        Queue one weekly meal plan per baby and return the batch id.
+
+        Each request is the one generate_weekly_meal_plan sends, with the
+        baby's id as its custom_id.
+        """
+        return self._submit([
+            (str(baby.id), self.llm_service._weekly_meal_plan_request(baby, preferences))
+            for baby in babies
+        ])
+
+    def poll_and_collect(
+        self,
+        batch_id: str,
+        poll_interval_seconds: float = 60.0
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Wait for a batch to finish, then yield (baby_id, parsed JSON answer).
+
+        Requests that failed inside a completed batch are skipped; a batch
+        that failed, expired or was cancelled as a whole raises RuntimeError.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        while batch.status not in _FINISHED_STATUSES:
+            time.sleep(poll_interval_seconds)
+            batch = self.client.batches.retrieve(batch_id)
+
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status '{batch.status}'")
+        if not batch.output_file_id:
+            return
+
+        output = self.client.files.content(batch.output_file_id).read()
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            content = _json_message_text(response["body"]["choices"][0]["message"])
+            yield int(result["custom_id"]), orjson.loads(content)
+
+    def _submit(self, requests: List[Tuple[str, Dict[str, Any]]]) -> str:
+        """Upload (custom_id, completion arguments) pairs as a JSONL batch."""
+        lines = b"\n".join(
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            })
+            for custom_id, body in requests
+        )
+        input_file = self.client.files.create(
+            file=("requests.jsonl", lines),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
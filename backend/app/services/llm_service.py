@@ -4,12 +4,296 @@ LLM service for AI-enhanced recommendations and explanations.
 Core value: Adds natural language understanding and generation to the rule-based engine.
 NOT replacing the recommendation logic, but enhancing user experience.
 """
+import asyncio
+import hashlib
+import logging
 import os
-from typing import List, Dict, Optional
-from openai import OpenAI
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, List, Dict, Optional, Tuple, Type
 
+import httpx
+import numpy as np
+import orjson
+from fastapi import HTTPException, status
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+    pydantic_function_tool
+)
+from pydantic import BaseModel
+
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.models.baby import Baby
 from app.models.recipe import Recipe
+from app.schemas.smart_recommendation import (
+    AdaptedRecipe,
+    DailyMealPlan,
+    RetryStrategyAdvice,
+    WeeklyMealPlan
+)
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Rotated across the days so the week stays balanced even though each day
+# is generated by an independent completion
+_DAILY_NUTRIENT_FOCUS = ("iron", "calcium", "protein")
+
+# Failures left after the SDK's own retries that mean the API is degraded
+# (connection errors include timeouts)
+_OUTAGE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+# Canned answers for the conversational methods while the circuit is open
+_CHAT_UNAVAILABLE_REPLY = (
+    "Sorry, I can't reach the nutrition assistant right now. Please try again in a minute. "
+    "Consult your pediatrician for medical concerns."
+)
+_QUESTION_UNAVAILABLE_REPLY = (
+    "Sorry, answers are temporarily unavailable. Please ask again in a minute. "
+    "Note: Consult your pediatrician for personalized medical advice."
+)
+
+# Completion text keyed by a digest of the request; prompts embed the baby
+# profile and request data, so the key changes whenever either does
+_completion_cache = TTLCache(
+    maxsize=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL_SECONDS
+)
+
+
+# Finish reasons of whole answers; truncated ("length") or filtered
+# completions are returned but never cached
+_CACHEABLE_FINISH_REASONS = frozenset({"stop", "tool_calls"})
+
+
+# Async completions being fetched, by cache key (single-flight); entries
+# are removed as soon as the answer or error is in
+_inflight_completions: Dict[str, "asyncio.Future[str]"] = {}
+
+
+def _structured_output(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Completion arguments forcing the answer through a strict function tool.
+
+    With strict schemas the model can only call the tool with arguments
+    that validate against `model` (every field present, correctly typed),
+    which JSON mode alone doesn't guarantee.
+    """
+    tool = pydantic_function_tool(model)
+    return dict(
+        tools=[tool],
+        tool_choice={"type": "function", "function": {"name": tool["function"]["name"]}}
+    )
+
+
+# Built once: the tool schemas are part of every request (and cache key)
+_RETRY_STRATEGY_OUTPUT = _structured_output(RetryStrategyAdvice)
+_DAILY_MEAL_PLAN_OUTPUT = _structured_output(DailyMealPlan)
+_WEEKLY_MEAL_PLAN_OUTPUT = _structured_output(WeeklyMealPlan)
+_ADAPTED_RECIPE_OUTPUT = _structured_output(AdaptedRecipe)
+
+
+def _message_text(message: Any) -> str:
+    """A completion message's answer: the forced tool call's arguments, else its content."""
+    if message.tool_calls:
+        return message.tool_calls[0].function.arguments
+    return message.content
+
+
+def _json_message_text(message: Dict[str, Any]) -> str:
+    """_message_text for a message decoded straight from response JSON."""
+    if message.get("tool_calls"):
+        return message["tool_calls"][0]["function"]["arguments"]
+    return message["content"]
+
+
+def _cacheable(finish_reason: Optional[str], content: Optional[str]) -> bool:
+    """Whether a completion is a whole, non-empty answer worth caching."""
+    return finish_reason in _CACHEABLE_FINISH_REASONS and bool(content)
+
+
+def _completion_cache_key(request: Dict[str, Any]) -> str:
+    """Stable digest of a chat completion request."""
+    return hashlib.blake2b(
+        orjson.dumps(request, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).hexdigest()
+
+
+def _http_limits() -> httpx.Limits:
+    """Connection pool limits for the OpenAI HTTP clients."""
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_SECONDS
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    """Per-attempt timeouts for the OpenAI HTTP clients."""
+    return httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=5.0)
+
+
+# Rough size of an English token; close enough for budgeting without a tokenizer
+_CHARS_PER_TOKEN = 4
+
+
+def _estimate_tokens(request: Dict[str, Any]) -> int:
+    """
+    Upper-bound token cost of a completion request for rate limiting.
+
+    OpenAI counts a request's prompt plus its max_tokens against the TPM
+    limit; the prompt is approximated from its length in characters.
+    """
+    prompt_chars = sum(len(message["content"]) for message in request["messages"])
+    return prompt_chars // _CHARS_PER_TOKEN + request.get("max_tokens", settings.LLM_MAX_TOKENS)
+
+
+def _trim_history(history: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    The most recent conversation turns that fit in max_tokens.
+
+    Older messages are dropped first, and the kept history never opens
+    with an orphaned assistant reply.
+    """
+    budget = max_tokens * _CHARS_PER_TOKEN
+    start = len(history)
+    while start > 0 and len(history[start - 1]["content"]) <= budget:
+        start -= 1
+        budget -= len(history[start]["content"])
+    while start < len(history) and history[start]["role"] == "assistant":
+        start += 1
+    return history[start:]
+
+
+def _record_usage(request: Dict[str, Any], finish_reason: Optional[str], completion_tokens: Optional[int]) -> None:
+    """
+    Log a completion's output length against its max_tokens.
+
+    DEBUG lines give the data for right-sizing each request's max_tokens;
+    a completion cut off by the limit is a warning (truncated JSON fails
+    to parse).
+    """
+    if finish_reason == "length":
+        logger.warning(
+            "Completion stopped at max_tokens=%s (model %s); the answer is truncated",
+            request.get("max_tokens"), request.get("model")
+        )
+    else:
+        logger.debug(
+            "Completion used %s of max_tokens=%s (model %s)",
+            completion_tokens, request.get("max_tokens"), request.get("model")
+        )
+
+
+class LLMScheduler:
+    """
+    Request and token buckets that keep async completions under the
+    account's per-minute OpenAI limits.
+
+    Both buckets refill continuously (a full minute's budget per minute).
+    A completion waits until one request and its estimated tokens are
+    available, so a large fan-out is spread out instead of bursting into
+    429s; waiters are served in arrival order. Completions that still hit
+    a 429 are retried by the OpenAI client.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated_at) / 60.0
+        self._updated_at = now
+        self._requests = min(
+            self.requests_per_minute,
+            self._requests + elapsed_minutes * self.requests_per_minute
+        )
+        self._tokens = min(
+            self.tokens_per_minute,
+            self._tokens + elapsed_minutes * self.tokens_per_minute
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until a request with this many tokens may be sent, and take them."""
+        # A request larger than the whole bucket waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_minutes = max(
+                    (1 - self._requests) / self.requests_per_minute,
+                    (tokens - self._tokens) / self.tokens_per_minute
+                )
+                await asyncio.sleep(wait_minutes * 60.0)
+
+
+class LLMUnavailableError(HTTPException):
+    """Raised without calling OpenAI while the circuit breaker is open (503)."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service temporarily unavailable, please try again shortly"
+        )
+
+
+class CircuitBreaker:
+    """
+    Stops calling OpenAI for a while once calls keep failing.
+
+    Every completion already gets the SDK's retries with backoff; a call
+    that still fails with an outage error counts against the breaker.
+    After fail_max consecutive failures it opens: for reset_timeout
+    seconds calls raise LLMUnavailableError immediately instead of
+    piling up on a degraded API. Then calls are let through again; one
+    success closes the breaker, another failure reopens it.
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        # Sync completions run in worker threads
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run the enclosed OpenAI call unless the breaker is open, recording its outcome."""
+        with self._lock:
+            if (
+                self._failures >= self.fail_max
+                and time.monotonic() - self._opened_at < self.reset_timeout
+            ):
+                raise LLMUnavailableError()
+        try:
+            yield
+        except _OUTAGE_ERRORS:
+            with self._lock:
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    self._opened_at = time.monotonic()
+            raise
+        with self._lock:
+            self._failures = 0
 
 
 class LLMService:
@@ -25,8 +309,6 @@ class LLMService:
     """
     
     def __init__(self, api_key: Optional[str] = None):
-        from app.core.config import settings
-        
         # Use provided api_key, fallback to settings
         self.api_key = api_key or settings.OPENAI_API_KEY
         
@@ -36,8 +318,190 @@ class LLMService:
                 "Set OPENAI_API_KEY in .env file or pass api_key parameter."
             )
         
-        self.client = OpenAI(api_key=self.api_key)
+        # The SDK retries rate-limited (429) and transient failures itself,
+        # with jittered exponential backoff. Sync routes run in worker
+        # threads that share this client's keep-alive pool
+        self.client = OpenAI(
+            api_key=self.api_key,
+            max_retries=settings.LLM_MAX_RETRIES,
+            timeout=_http_timeout(),
+            http_client=DefaultHttpxClient(limits=_http_limits())
+        )
+        # Used by the async endpoints so a slow completion never holds a
+        # worker thread; both clients share the same prompts.
+        # Every pooled connection is kept alive (the SDK default keeps 100 of
+        # 1000 for 5s), so fan-out bursts and requests a few seconds apart
+        # reuse warm TLS connections instead of opening new ones
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            max_retries=settings.LLM_MAX_RETRIES,
+            timeout=_http_timeout(),
+            http_client=DefaultAsyncHttpxClient(limits=_http_limits())
+        )
         self.model = settings.LLM_MODEL
+        # Short, formulaic outputs (explanations, retry strategies, trend
+        # notes) go to the fast tier; plans, adaptations and open-ended
+        # answers to the smart one. Both default to LLM_MODEL
+        self.fast_model = settings.LLM_MODEL_FAST or self.model
+        self.smart_model = settings.LLM_MODEL_SMART or self.model
+        # Paces the async client (fan-outs) under the account's rate limits
+        self.scheduler = LLMScheduler(settings.OPENAI_RPM, settings.OPENAI_TPM)
+        # Shared by both clients: an outage affects them alike
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAIL_MAX, settings.LLM_BREAKER_RESET_SECONDS)
+        # Per-call options that don't change the answer (kept out of cache keys)
+        self.request_options: Dict[str, Any] = {}
+        if settings.LLM_SERVICE_TIER:
+            self.request_options["service_tier"] = settings.LLM_SERVICE_TIER
+    
+    def complete(self, request: Dict[str, Any], parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Run a chat completion and return the message content.
+        
+        Responses are cached by a hash of the full request (model, prompt
+        and sampling parameters), so a repeated prompt for an unchanged
+        baby profile skips the OpenAI round trip.
+        
+        With parse, the parsed content is returned instead, and the answer
+        is only cached once parse accepts it. Truncated, filtered or empty
+        answers are never cached.
+        """
+        key = _completion_cache_key(request)
+        content = _completion_cache.get(key)
+        if content is not None:
+            return parse(content) if parse else content
+        
+        with self.breaker.guard():
+            response = self.client.chat.completions.create(**request, **self.request_options)
+        choice = response.choices[0]
+        _record_usage(request, choice.finish_reason, response.usage and response.usage.completion_tokens)
+        content = _message_text(choice.message)
+        result = parse(content) if parse else content
+        if _cacheable(choice.finish_reason, content):
+            _completion_cache.set(key, content)
+        return result
+    
+    async def acomplete(self, request: Dict[str, Any], parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Async variant of complete, sharing the same response cache.
+        
+        Concurrent fan-outs run through here, so the response body is
+        decoded with orjson and only the answer text read from it; the
+        SDK's typed ChatCompletion is never built. The raw-response call
+        keeps the client's connection pool and retries.
+        
+        Identical requests that arrive while one is in flight wait for its
+        answer (or error) instead of calling OpenAI again.
+        """
+        key = _completion_cache_key(request)
+        while True:
+            content = _completion_cache.get(key)
+            if content is not None:
+                return parse(content) if parse else content
+            # An identical request is already being fetched: share its answer
+            inflight = _inflight_completions.get(key)
+            if inflight is None:
+                break
+            try:
+                content = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Start over only if the awaited request was cancelled, not this one
+                if not inflight.cancelled():
+                    raise
+            else:
+                return parse(content) if parse else content
+        
+        future = asyncio.get_running_loop().create_future()
+        _inflight_completions[key] = future
+        try:
+            content, finish_reason = await self._afetch(request)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; don't report it as never retrieved
+            future.exception()
+            raise
+        finally:
+            del _inflight_completions[key]
+        future.set_result(content)
+        result = parse(content) if parse else content
+        if _cacheable(finish_reason, content):
+            _completion_cache.set(key, content)
+        return result
+    
+    async def _afetch(self, request: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """Request one completion from OpenAI (no caching): its text and finish reason."""
+        with self.breaker.guard():
+            await self.scheduler.acquire(_estimate_tokens(request))
+            response = await self.async_client.chat.completions.with_raw_response.create(
+                **request, **self.request_options
+            )
+        body = orjson.loads(response.http_response.content)
+        choice = body["choices"][0]
+        _record_usage(request, choice.get("finish_reason"), (body.get("usage") or {}).get("completion_tokens"))
+        return _json_message_text(choice["message"]), choice.get("finish_reason")
+    
+    async def astream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Streaming variant of acomplete, yielding text fragments.
+        
+        The first fragment arrives as soon as the model emits it instead of
+        after the whole completion. The assembled answer is stored in the
+        completion cache unless it was cut off, and a cached answer is
+        yielded in one piece.
+        """
+        key = _completion_cache_key(request)
+        content = _completion_cache.get(key)
+        if content is not None:
+            yield content
+            return
+        
+        parts = []
+        finish_reason = completion_tokens = None
+        with self.breaker.guard():
+            await self.scheduler.acquire(_estimate_tokens(request))
+            # include_usage adds a final chunk (no choices) carrying the token counts
+            stream = await self.async_client.chat.completions.create(
+                **request, **self.request_options, stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                if chunk.usage:
+                    completion_tokens = chunk.usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        _record_usage(request, finish_reason, completion_tokens)
+        content = "".join(parts)
+        if _cacheable(finish_reason, content):
+            _completion_cache.set(key, content)
+    
+    def _complete_or(self, request: Dict[str, Any], fallback: str) -> str:
+        """complete, answering with fallback while the circuit breaker is open."""
+        try:
+            return self.complete(request)
+        except LLMUnavailableError:
+            return fallback
+    
+    async def _acomplete_or(self, request: Dict[str, Any], fallback: str) -> str:
+        """Async variant of _complete_or."""
+        try:
+            return await self.acomplete(request)
+        except LLMUnavailableError:
+            return fallback
+    
+    async def _astream_or(self, request: Dict[str, Any], fallback: str) -> AsyncIterator[str]:
+        """Streaming variant of _complete_or."""
+        try:
+            async for fragment in self.astream(request):
+                yield fragment
+        except LLMUnavailableError:
+            yield fallback
     
     def generate_recipe_explanation(
         self,
@@ -61,14 +525,36 @@ class LLMService:
         Returns:
             Natural language explanation
         """
+        return self.complete(self._recipe_explanation_request(recipe, baby, why_recommended))
+    
+    async def agenerate_recipe_explanation(
+        self,
+        recipe: Recipe,
+        baby: Baby,
+        why_recommended: str
+    ) -> str:
+        """Async variant of generate_recipe_explanation."""
+        return await self.acomplete(self._recipe_explanation_request(recipe, baby, why_recommended))
+    
+    def astream_recipe_explanation(
+        self,
+        recipe: Recipe,
+        baby: Baby,
+        why_recommended: str
+    ) -> AsyncIterator[str]:
+        """Streaming variant of generate_recipe_explanation (see astream)."""
+        return self.astream(self._recipe_explanation_request(recipe, baby, why_recommended))
+    
+    def _recipe_explanation_request(
+        self,
+        recipe: Recipe,
+        baby: Baby,
+        why_recommended: str
+    ) -> Dict[str, Any]:
+        """Build the completion arguments for a recipe explanation."""
         prompt = f"""You are a certified infant nutrition expert. Generate a warm, informative explanation for why this recipe is recommended.
 
-Baby Profile:
-- Name: {baby.name}
-- Age: {baby.age_months} months ({baby.age_stage} stage)
-- Weight: {baby.weight_kg}kg
-- Allergies: {', '.join(baby.allergies) if baby.allergies else 'None'}
-- Likes: {', '.join(baby.liked_ingredients) if baby.liked_ingredients else 'exploring new foods'}
+{baby.profile_block}
 
 Recommended Recipe: {recipe.name}
 Key nutrients:
@@ -86,14 +572,12 @@ Generate a 2-3 sentence explanation that:
 
 Keep it warm, encouraging, and informative."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.fast_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
             temperature=0.7
         )
-        
-        return response.choices[0].message.content
     
     def generate_retry_strategy(self, context: Dict) -> Dict[str, str]:
         """
@@ -105,6 +589,18 @@ Keep it warm, encouraging, and informative."""
         Returns:
             Strategy dict with recommendations
         """
+        return self.complete(
+            self._retry_strategy_request(context), parse=RetryStrategyAdvice.model_validate_json
+        ).model_dump()
+    
+    async def agenerate_retry_strategy(self, context: Dict) -> Dict[str, str]:
+        """Async variant of generate_retry_strategy."""
+        return (await self.acomplete(
+            self._retry_strategy_request(context), parse=RetryStrategyAdvice.model_validate_json
+        )).model_dump()
+    
+    def _retry_strategy_request(self, context: Dict) -> Dict[str, Any]:
+        """Build the completion arguments for a retry strategy."""
         prompt = f"""Generate a retry strategy for introducing a food to a baby.
 
 Ingredient: {context['ingredient']}
@@ -128,16 +624,110 @@ Return JSON:
 }}
 """
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.fast_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
             temperature=0.7,
+            **_RETRY_STRATEGY_OUTPUT
+        )
+    
+    def generate_recommendation_bundle(
+        self,
+        baby: Baby,
+        recipes: List[Tuple[Recipe, str]],
+        alternatives: Dict[str, str],
+        retries: Dict[str, Dict],
+        retry_count: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Generate all the text for a smart recommendation set in one completion.
+
+        Replaces one call per recipe explanation, per disliked ingredient and
+        per retry strategy (plus the summary) with a single JSON-mode request.
+
+        Args:
+            baby: Baby profile
+            recipes: (recipe, technical reason) pairs to explain, in order
+            alternatives: Disliked ingredient -> its nutritional role
+            retries: Ingredient to retry -> attempt_count and nutrition_importance
+            retry_count: Recommended recipes that retry a disliked food
+
+        Returns:
+            Dict with "explanations" (aligned with recipes), "alternatives" and
+            "retry_strategies" (keyed by ingredient) and "overall_explanation"
+        """
+        return self.complete(self._recommendation_bundle_request(
+            baby, recipes, alternatives, retries, retry_count
+        ), parse=orjson.loads)
+    
+    async def agenerate_recommendation_bundle(
+        self,
+        baby: Baby,
+        recipes: List[Tuple[Recipe, str]],
+        alternatives: Dict[str, str],
+        retries: Dict[str, Dict],
+        retry_count: int = 0
+    ) -> Dict[str, Any]:
+        """Async variant of generate_recommendation_bundle."""
+        return await self.acomplete(self._recommendation_bundle_request(
+            baby, recipes, alternatives, retries, retry_count
+        ), parse=orjson.loads)
+    
+    def _recommendation_bundle_request(
+        self,
+        baby: Baby,
+        recipes: List[Tuple[Recipe, str]],
+        alternatives: Dict[str, str],
+        retries: Dict[str, Dict],
+        retry_count: int
+    ) -> Dict[str, Any]:
+        """Build the completion arguments for a recommendation bundle."""
+        sections = []
+        if recipes:
+            sections.append("Recommended recipes:\n" + "\n".join(
+                f"{number}. {recipe.name} (Protein: {recipe.protein_g}g, Iron: {recipe.iron_mg}mg, "
+                f"Calcium: {recipe.calcium_mg}mg, Fiber: {recipe.fiber_g}g) - technical reason: {reason}"
+                for number, (recipe, reason) in enumerate(recipes, 1)
+            ))
+        if alternatives:
+            sections.append("Ingredients the baby rejected (suggest 3 alternatives each with similar nutrition, "
+                            "a different taste/texture, age-appropriate):\n" + "\n".join(
+                f"- {ingredient}: {role}" for ingredient, role in alternatives.items()
+            ))
+        if retries:
+            sections.append("Ingredients to retry (attempts < 3: different preparation; 3-5: mix with favorite "
+                            "foods; > 5: take a break, focus on alternatives):\n" + "\n".join(
+                f"- {ingredient}: {context['attempt_count']} previous attempts, "
+                f"{context['nutrition_importance']} nutritional importance"
+                for ingredient, context in retries.items()
+            ))
+
+        prompt = f"""You are a certified infant nutrition expert writing for parents.
+
+{baby.profile_block}
+
+{chr(10).join(sections)}
+
+Foods being retried in today's recipes: {retry_count}
+
+Return JSON:
+{{
+  "explanations": ["one 2-3 sentence explanation per recommended recipe, in the numbered order: nutritional benefits, why it suits this baby, one serving tip"],
+  "alternatives": {{"<rejected ingredient>": [{{"ingredient": "...", "reason": "...", "preparation_tip": "..."}}]}},
+  "retry_strategies": {{"<ingredient to retry>": {{"strategy": "...", "rationale": "...", "specific_suggestion": "..."}}}},
+  "overall_explanation": "a warm, encouraging 2-3 sentence summary of today's strategy"
+}}
+"""
+
+        return dict(
+            model=self.fast_model,
+            messages=[{"role": "user", "content": prompt}],
+            # The budgets the separate calls used to get
+            max_tokens=150 + 200 * len(recipes) + 400 * len(alternatives) + 200 * len(retries),
+            temperature=0.7,
             response_format={"type": "json_object"}
         )
-        
-        import json
-        return json.loads(response.choices[0].message.content)
     
     def answer_nutrition_question(
         self,
@@ -161,11 +751,47 @@ Return JSON:
         Returns:
             AI-generated answer with safety disclaimer
         """
+        return self._complete_or(
+            self._nutrition_question_request(question, baby, context_recipes),
+            _QUESTION_UNAVAILABLE_REPLY
+        )
+    
+    async def aanswer_nutrition_question(
+        self,
+        question: str,
+        baby: Baby,
+        context_recipes: Optional[List[Recipe]] = None
+    ) -> str:
+        """Async variant of answer_nutrition_question."""
+        return await self._acomplete_or(
+            self._nutrition_question_request(question, baby, context_recipes),
+            _QUESTION_UNAVAILABLE_REPLY
+        )
+    
+    def astream_nutrition_question(
+        self,
+        question: str,
+        baby: Baby,
+        context_recipes: Optional[List[Recipe]] = None
+    ) -> AsyncIterator[str]:
+        """Streaming variant of answer_nutrition_question (see astream)."""
+        return self._astream_or(
+            self._nutrition_question_request(question, baby, context_recipes),
+            _QUESTION_UNAVAILABLE_REPLY
+        )
+    
+    def _nutrition_question_request(
+        self,
+        question: str,
+        baby: Baby,
+        context_recipes: Optional[List[Recipe]] = None
+    ) -> Dict[str, Any]:
+        """Build the completion arguments for a nutrition question."""
         # Build context
         context = f"""Baby Context:
 - {baby.name}, {baby.age_months} months old
 - Current stage: {baby.age_stage}
-- Allergies: {', '.join(baby.allergies) if baby.allergies else 'None'}
+- Allergies: {baby.allergies_text}
 """
         
         if context_recipes:
@@ -188,14 +814,12 @@ Provide:
 Keep response under 150 words. Always end with: "Note: Consult your pediatrician for personalized medical advice."
 """
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.smart_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=250,
             temperature=0.7
         )
-        
-        return response.choices[0].message.content
     
     def generate_weekly_meal_plan(
         self,
@@ -214,21 +838,84 @@ Keep response under 150 words. Always end with: "Note: Consult your pediatrician
         Returns:
             Weekly plan with breakfast, lunch, dinner, snacks
         """
+        return self.complete(
+            self._weekly_meal_plan_request(baby, preferences), parse=WeeklyMealPlan.model_validate_json
+        ).model_dump()
+    
+    async def agenerate_weekly_meal_plan(
+        self,
+        baby: Baby,
+        preferences: Dict = None
+    ) -> Dict[str, List[Dict]]:
+        """
+        Async variant of generate_weekly_meal_plan.
+        
+        Generates the seven days as concurrent completions (at most
+        LLM_MAX_CONCURRENCY in flight), so latency is that of one short
+        day rather than one long week.
+        """
+        semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        
+        async def generate_day(index: int, day: str) -> Dict:
+            async with semaphore:
+                plan = await self.acomplete(
+                    self._daily_meal_plan_request(baby, index, day), parse=DailyMealPlan.model_validate_json
+                )
+            return plan.model_dump()
+        
+        days = await asyncio.gather(
+            *(generate_day(index, day) for index, day in enumerate(WEEKDAYS))
+        )
+        return dict(zip(WEEKDAYS, days))
+    
+    def _daily_meal_plan_request(self, baby: Baby, index: int, day: str) -> Dict[str, Any]:
+        """Build the completion arguments for one day of a weekly meal plan."""
+        focus = _DAILY_NUTRIENT_FOCUS[index % len(_DAILY_NUTRIENT_FOCUS)]
+        
+        prompt = f"""Generate the {day} meals (day {index + 1} of a 7-day plan) for a {baby.age_months}-month-old baby.
+
+Baby Profile:
+- Stage: {baby.age_stage}
+- Allergies: {baby.allergies_text}
+- Preferences: {baby.liked_ingredients_text or 'None specified'}
+
+Requirements:
+- 3 meals + 2 snacks
+- Emphasize {focus}-rich foods today
+- Use ingredients and cuisines that would differ from other days of the week
+- Age-appropriate textures
+- Avoid allergens: {baby.allergies_text}
+
+Return ONLY a JSON object with this structure:
+{{"breakfast": "...", "lunch": "...", "dinner": "...", "snack1": "...", "snack2": "..."}}
+
+Be specific with meal names."""
+
+        return dict(
+            model=self.smart_model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=200,
+            temperature=0.8,
+            **_DAILY_MEAL_PLAN_OUTPUT
+        )
+    
+    def _weekly_meal_plan_request(self, baby: Baby, preferences: Dict = None) -> Dict[str, Any]:
+        """Build the completion arguments for a weekly meal plan."""
         preferences = preferences or {}
         
         prompt = f"""Generate a 7-day meal plan for a {baby.age_months}-month-old baby.
 
 Baby Profile:
 - Stage: {baby.age_stage}
-- Allergies: {', '.join(baby.allergies) if baby.allergies else 'None'}
-- Preferences: {', '.join(baby.liked_ingredients) if baby.liked_ingredients else 'None specified'}
+- Allergies: {baby.allergies_text}
+- Preferences: {baby.liked_ingredients_text or 'None specified'}
 
 Requirements:
 - 3 meals + 2 snacks per day
 - Balance protein, iron, calcium across the week
 - Variety in ingredients and cuisines
 - Age-appropriate textures
-- Avoid allergens: {', '.join(baby.allergies) if baby.allergies else 'None'}
+- Avoid allergens: {baby.allergies_text}
 
 Return ONLY a JSON object with this structure:
 {{
@@ -239,16 +926,13 @@ Return ONLY a JSON object with this structure:
 
 Be specific with meal names."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.smart_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=1000,
             temperature=0.8,
-            response_format={"type": "json_object"}
+            **_WEEKLY_MEAL_PLAN_OUTPUT
         )
-        
-        import json
-        return json.loads(response.choices[0].message.content)
     
     def adapt_recipe(
         self,
@@ -266,14 +950,36 @@ Be specific with meal names."""
         
         Value: Maintains nutritional data structure while adapting
         """
+        return self.complete(
+            self._adapt_recipe_request(recipe, adaptation_request, baby), parse=AdaptedRecipe.model_validate_json
+        ).model_dump()
+    
+    async def aadapt_recipe(
+        self,
+        recipe: Recipe,
+        adaptation_request: str,
+        baby: Baby
+    ) -> Dict[str, str]:
+        """Async variant of adapt_recipe."""
+        return (await self.acomplete(
+            self._adapt_recipe_request(recipe, adaptation_request, baby), parse=AdaptedRecipe.model_validate_json
+        )).model_dump()
+    
+    def _adapt_recipe_request(
+        self,
+        recipe: Recipe,
+        adaptation_request: str,
+        baby: Baby
+    ) -> Dict[str, Any]:
+        """Build the completion arguments for a recipe adaptation."""
         prompt = f"""Adapt this baby food recipe based on the request.
 
 Original Recipe: {recipe.name}
-Ingredients: {[ing['name'] for ing in recipe.ingredients]}
+Ingredients: {recipe.ingredients_csv}
 Instructions: {recipe.instructions}
 
 Baby: {baby.age_months} months, {baby.age_stage} stage
-Allergies: {', '.join(baby.allergies) if baby.allergies else 'None'}
+Allergies: {baby.allergies_text}
 
 Adaptation Request: {adaptation_request}
 
@@ -292,38 +998,82 @@ Format as JSON:
 }}
 """
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.smart_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=500,
-            temperature=0.7,
-            response_format={"type": "json_object"}
+            # Deterministic: the same adaptation of the same recipe should
+            # read the same every time, and repeats are served from the cache
+            temperature=0,
+            **_ADAPTED_RECIPE_OUTPUT
         )
-        
-        import json
-        return json.loads(response.choices[0].message.content)
     
     def analyze_nutrition_trend(
         self,
         baby: Baby,
         recent_meals: List[Recipe],
-        time_period: str = "past week"
+        time_period: str = "past week",
+        nutrient_totals: Optional[Dict[str, float]] = None,
+        meal_count: Optional[int] = None
     ) -> str:
         """
         Analyze nutritional trends and provide insights.
         
         Value: Combines structured data analysis with natural language insights
+        
+        Callers that already aggregated in SQL pass nutrient_totals and
+        meal_count; recent_meals then only needs the meals to list.
         """
-        # Calculate aggregate nutrition
-        total_iron = sum(r.iron_mg or 0.0 for r in recent_meals)
-        total_protein = sum(r.protein_g or 0.0 for r in recent_meals)
-        total_calcium = sum(r.calcium_mg or 0.0 for r in recent_meals)
+        return self.complete(self._nutrition_trend_request(
+            baby, recent_meals, time_period, nutrient_totals, meal_count
+        ))
+    
+    async def aanalyze_nutrition_trend(
+        self,
+        baby: Baby,
+        recent_meals: List[Recipe],
+        time_period: str = "past week",
+        nutrient_totals: Optional[Dict[str, float]] = None,
+        meal_count: Optional[int] = None
+    ) -> str:
+        """Async variant of analyze_nutrition_trend."""
+        return await self.acomplete(self._nutrition_trend_request(
+            baby, recent_meals, time_period, nutrient_totals, meal_count
+        ))
+    
+    def _nutrition_trend_request(
+        self,
+        baby: Baby,
+        recent_meals: List[Recipe],
+        time_period: str,
+        nutrient_totals: Optional[Dict[str, float]] = None,
+        meal_count: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build the completion arguments for a nutrition trend analysis."""
+        # Calculate aggregate nutrition unless the caller already did
+        if nutrient_totals is None:
+            # One pass over the meals, reduced column-wise in NumPy
+            nutrients = np.fromiter(
+                (
+                    (r.iron_mg or 0.0, r.protein_g or 0.0, r.calcium_mg or 0.0)
+                    for r in recent_meals
+                ),
+                dtype=np.dtype((np.float64, 3)),
+                count=len(recent_meals)
+            )
+            total_iron, total_protein, total_calcium = nutrients.sum(axis=0)
+        else:
+            total_iron = nutrient_totals["iron_mg"]
+            total_protein = nutrient_totals["protein_g"]
+            total_calcium = nutrient_totals["calcium_mg"]
+        if meal_count is None:
+            meal_count = len(recent_meals)
         
         prompt = f"""Analyze the nutritional trends for this baby's diet.
 
 Baby: {baby.name}, {baby.age_months} months old
 
-Meals in {time_period} ({len(recent_meals)} meals):
+Meals in {time_period} ({meal_count} meals):
 {chr(10).join(f"- {r.name}: Iron {r.iron_mg}mg, Protein {r.protein_g}g, Calcium {r.calcium_mg}mg" for r in recent_meals[:10])}
 
 Aggregate totals:
@@ -344,14 +1094,14 @@ Provide:
 
 Keep under 100 words."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.fast_model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
-            temperature=0.7
+            # Deterministic, like adaptations: an unchanged meal history
+            # gets the same assessment
+            temperature=0
         )
-        
-        return response.choices[0].message.content
     
     def chat_with_context(
         self,
@@ -364,6 +1114,42 @@ Keep under 100 words."""
         
         Value: ChatGPT with memory and context
         """
+        return self._complete_or(
+            self._chat_request(user_message, baby, conversation_history),
+            _CHAT_UNAVAILABLE_REPLY
+        )
+    
+    async def achat_with_context(
+        self,
+        user_message: str,
+        baby: Baby,
+        conversation_history: List[Dict] = None
+    ) -> str:
+        """Async variant of chat_with_context."""
+        return await self._acomplete_or(
+            self._chat_request(user_message, baby, conversation_history),
+            _CHAT_UNAVAILABLE_REPLY
+        )
+    
+    def achat_stream(
+        self,
+        user_message: str,
+        baby: Baby,
+        conversation_history: List[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Streaming variant of chat_with_context (see astream)."""
+        return self._astream_or(
+            self._chat_request(user_message, baby, conversation_history),
+            _CHAT_UNAVAILABLE_REPLY
+        )
+    
+    def _chat_request(
+        self,
+        user_message: str,
+        baby: Baby,
+        conversation_history: List[Dict] = None
+    ) -> Dict[str, Any]:
+        """Build the completion arguments for a context-aware chat turn."""
         conversation_history = conversation_history or []
         
         # System prompt with baby context
@@ -372,8 +1158,8 @@ Keep under 100 words."""
 Baby Profile:
 - Age: {baby.age_months} months ({baby.age_stage} stage)
 - Weight: {baby.weight_kg}kg, Height: {baby.height_cm}cm
-- Allergies: {', '.join(baby.allergies) if baby.allergies else 'None'}
-- Favorite foods: {', '.join(baby.liked_ingredients) if baby.liked_ingredients else 'Still exploring'}
+- Allergies: {baby.allergies_text}
+- Favorite foods: {baby.liked_ingredients_text or 'Still exploring'}
 
 Your role:
 - Provide safe, evidence-based infant nutrition advice
@@ -384,15 +1170,88 @@ Your role:
 Always end with: "Consult your pediatrician for medical concerns."
 """
 
+        # The profile stays first; only old turns are dropped from long chats
         messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(conversation_history)
+        messages.extend(_trim_history(conversation_history, settings.LLM_CHAT_HISTORY_TOKENS))
         messages.append({"role": "user", "content": user_message})
         
-        response = self.client.chat.completions.create(
-            model=self.model,
+        return dict(
+            model=self.smart_model,
             messages=messages,
             max_tokens=300,
             temperature=0.7
         )
-        
-        return response.choices[0].message.content
\ No newline at end of file
+
+    async def agenerate_dashboard(
+        self,
+        baby: Baby,
+        recent_meals: List[Recipe],
+        top_recipe: Recipe,
+        why_recommended: str
+    ) -> Dict[str, Any]:
+        """
+        Generate the top recipe's explanation, the nutrition trend and the
+        weekly plan concurrently.
+
+        The three calls share no data, so they run together and the
+        dashboard takes as long as the slowest one. A failed call doesn't
+        fail the dashboard: its field falls back (the technical reason for
+        the explanation, None for the others).
+
+        Returns:
+            Dict with "recipe_explanation", "nutrition_trend" and "weekly_plan"
+        """
+        explanation, trend, plan = await asyncio.gather(
+            self.agenerate_recipe_explanation(top_recipe, baby, why_recommended),
+            self.aanalyze_nutrition_trend(baby, recent_meals),
+            self.agenerate_weekly_meal_plan(baby),
+            return_exceptions=True
+        )
+
+        fallbacks = {
+            "recipe_explanation": why_recommended,
+            "nutrition_trend": None,
+            "weekly_plan": None
+        }
+        dashboard = {}
+        for field, result in zip(fallbacks, (explanation, trend, plan)):
+            if isinstance(result, Exception):
+                logger.warning("Dashboard %s generation failed: %s", field, result)
+                result = fallbacks[field]
+            dashboard[field] = result
+        return dashboard
+
+
+_llm_service: Optional[LLMService] = None
+_llm_service_lock = threading.Lock()
+
+
+def get_llm_service() -> LLMService:
+    """
+    FastAPI dependency returning the process-wide LLMService.
+
+    Built on first use and then shared, so every request reuses the same
+    OpenAI clients and their keep-alive connection pools. A missing API
+    key is reported as a 500 and retried on the next request.
+    """
+    global _llm_service
+    if _llm_service is None:
+        with _llm_service_lock:
+            if _llm_service is None:
+                try:
+                    _llm_service = LLMService()
+                except ValueError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Failed to initialize AI services: {str(e)}"
+                    )
+    return _llm_service
+
+
+async def close_llm_service() -> None:
+    """Close the shared LLMService's HTTP clients (application shutdown)."""
+    global _llm_service
+    service, _llm_service = _llm_service, None
+    if service is not None:
+        await service.async_client.close()
+        service.client.close()
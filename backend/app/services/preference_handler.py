@@ -10,7 +10,11 @@ Instead:
 
 This is where LLM adds real value over simple filtering.
 """
-from typing import List, Dict, Tuple, Optional
+import heapq
+import json
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Dict, Sequence, Tuple, Optional
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 
@@ -108,14 +112,11 @@ class PreferenceHandler:
         """
         penalty = 1.0  # Start with no penalty
         
-        ingredient_names = [
-            ing.get('name', '').lower() 
-            for ing in (recipe.ingredients or [])
-        ]
+        ingredient_names = recipe.ingredient_names_lc
         
         # Check each disliked ingredient
-        for disliked in (baby.disliked_ingredients or []):
-            if any(disliked.lower() in ing for ing in ingredient_names):
+        for disliked, disliked_lc in zip(baby.disliked_ingredients or [], baby.disliked_ingredients_lc):
+            if any(disliked_lc in ing for ing in ingredient_names):
                 # Check attempt history
                 attempts = self._get_attempt_count(baby, disliked)
                 
@@ -131,7 +132,8 @@ class PreferenceHandler:
     def should_retry_ingredient(
         self,
         ingredient: str,
-        baby: Baby
+        baby: Baby,
+        today: Optional[date] = None
     ) -> Tuple[bool, str]:
         """
         Decide if it's time to retry a disliked ingredient.
@@ -141,6 +143,10 @@ class PreferenceHandler:
         2. Baby is older (taste changes with age)
         3. Different preparation method
         
+        Args:
+            today: Reference date (default: date.today()); pass one date
+                to keep every decision in a request on the same day
+        
         Returns:
             (should_retry, reason)
         """
@@ -151,7 +157,7 @@ class PreferenceHandler:
         
         last_attempt_date = attempt_history.get('last_try')
         if last_attempt_date:
-            days_since = (date.today() - last_attempt_date).days
+            days_since = ((today or date.today()) - last_attempt_date).days
             
             # Wait at least 14 days between retries
             if days_since < 14:
@@ -184,46 +190,55 @@ class PreferenceHandler:
         Returns:
             List of (recipe, alternative_ingredient, nutrition_similarity_score)
         """
-        # Find nutrition group
-        nutrition_group = self._find_nutrition_group(disliked_ingredient)
-        
-        if not nutrition_group:
-            return []
-        
-        # Get alternative ingredients from same nutrition group
-        alternatives = [
-            ing for ing in self.NUTRITION_GROUPS.get(nutrition_group, [])
-            if ing.lower() != disliked_ingredient.lower()
-        ]
-        
-        # Find recipes containing alternatives
-        alternative_recipes = []
+        return self.find_nutritional_alternatives_bulk([disliked_ingredient], baby)[disliked_ingredient]
+    
+    def find_nutritional_alternatives_bulk(
+        self,
+        disliked_ingredients: Sequence[str],
+        baby: Baby
+    ) -> Dict[str, List[Tuple[Recipe, str, float]]]:
+        """
+        find_nutritional_alternatives for several disliked ingredients,
+        fetching the candidate recipes for all of them in one query.
         
-        for alt_ingredient in alternatives:
-            # Query recipes containing this alternative
-            recipes = self.db.query(Recipe).filter(
-                Recipe.age_min_months <= baby.age_months
-            ).all()
+        Returns:
+            Disliked ingredient -> its top 5 (recipe, alternative_ingredient,
+            nutrition_similarity_score)
+        """
+        # Alternative ingredients from the same nutrition group as each dislike
+        alternatives_by_disliked = {}
+        for disliked in disliked_ingredients:
+            nutrition_group = self._find_nutrition_group(disliked)
+            alternatives_by_disliked[disliked] = [
+                ing for ing in self.NUTRITION_GROUPS.get(nutrition_group, [])
+                if ing.lower() != disliked.lower()
+            ] if nutrition_group else []
+        
+        # Recipes containing any alternative of any dislike, in one query
+        wanted = list(dict.fromkeys(
+            alt for alternatives in alternatives_by_disliked.values() for alt in alternatives
+        ))
+        recipes = self._candidate_recipes(baby, containing=wanted) if wanted else []
+        recipe_names = [(recipe, recipe.ingredient_names_lc) for recipe in recipes]
+        
+        results = {}
+        for disliked, alternatives in alternatives_by_disliked.items():
+            # Pair each recipe with the alternatives it contains
+            alternative_recipes = []
             
-            for recipe in recipes:
-                ingredient_names = [
-                    ing.get('name', '').lower() 
-                    for ing in (recipe.ingredients or [])
-                ]
+            for alt_ingredient in alternatives:
+                # Calculate nutrition similarity
+                similarity = self._calculate_nutrition_similarity(disliked, alt_ingredient)
+                alt_lower = alt_ingredient.lower()
                 
-                # Check if contains alternative ingredient
-                if any(alt_ingredient in ing for ing in ingredient_names):
-                    # Calculate nutrition similarity
-                    similarity = self._calculate_nutrition_similarity(
-                        disliked_ingredient, alt_ingredient
-                    )
-                    
-                    alternative_recipes.append((recipe, alt_ingredient, similarity))
-        
-        # Sort by similarity
-        alternative_recipes.sort(key=lambda x: x[2], reverse=True)
-        
-        return alternative_recipes[:5]  # Top 5 alternatives
+                for recipe, names in recipe_names:
+                    if any(alt_lower in name for name in names):
+                        alternative_recipes.append((recipe, alt_ingredient, similarity))
+            
+            # Top 5 by similarity (partial selection; ties keep insertion order)
+            results[disliked] = heapq.nlargest(5, alternative_recipes, key=itemgetter(2))
+        
+        return results
     
     def suggest_different_preparations(
         self,
@@ -244,25 +259,42 @@ class PreferenceHandler:
         Returns:
             List of (recipe, preparation_method)
         """
-        # Query all recipes with this ingredient
-        recipes = self.db.query(Recipe).filter(
-            Recipe.age_min_months <= baby.age_months
-        ).all()
+        return self.suggest_different_preparations_bulk([ingredient], baby)[ingredient]
+    
+    def suggest_different_preparations_bulk(
+        self,
+        ingredients: Sequence[str],
+        baby: Baby
+    ) -> Dict[str, List[Tuple[Recipe, str]]]:
+        """
+        suggest_different_preparations for several ingredients, fetching
+        the recipes for all of them in one query.
         
-        matching_recipes = []
+        Returns:
+            Ingredient -> list of (recipe, preparation_method)
+        """
+        if not ingredients:
+            return {}
+        
+        # Query all recipes with any of these ingredients
+        recipes = self._candidate_recipes(baby, containing=ingredients)
+        
+        # Infer each recipe's preparation method once
+        prepared = [
+            (recipe, recipe.ingredient_names_lc, self._infer_preparation_method(recipe))
+            for recipe in recipes
+        ]
         
-        for recipe in recipes:
-            ingredient_names = [
-                ing.get('name', '').lower() 
-                for ing in (recipe.ingredients or [])
+        results = {}
+        for ingredient in ingredients:
+            ingredient_lower = ingredient.lower()
+            results[ingredient] = [
+                (recipe, prep_method)
+                for recipe, names, prep_method in prepared
+                if any(ingredient_lower in name for name in names)
             ]
-            
-            if any(ingredient.lower() in ing for ing in ingredient_names):
-                # Infer preparation method from recipe
-                prep_method = self._infer_preparation_method(recipe)
-                matching_recipes.append((recipe, prep_method))
         
-        return matching_recipes
+        return results
     
     def generate_retry_recommendation(
         self,
@@ -298,16 +330,31 @@ class PreferenceHandler:
         
         return strategy
     
+    def _candidate_recipes(self, baby: Baby, containing: Sequence[str] = ()) -> List[Recipe]:
+        """
+        Recipes suitable for the baby's age and free of its allergens,
+        optionally only those with an ingredient matching any of `containing`.
+        """
+        query = Recipe.suitable_for_age_query(self.db, baby.age_months)
+        
+        if containing:
+            query = query.filter(Recipe.contains_ingredient(*containing))
+        
+        if not baby.allergies:
+            return query.all()
+        
+        # On PostgreSQL the allergen check runs in the query (GIN index)
+        if self.db.get_bind().dialect.name == "postgresql":
+            return query.filter(Recipe.excludes_allergens(baby.allergies)).all()
+        
+        return [recipe for recipe in query if not recipe.has_allergen(baby.allergies)]
+    
     def _find_nutrition_group(self, ingredient: str) -> Optional[str]:
         """Find which nutrition group an ingredient belongs to."""
         ingredient_lower = ingredient.lower()
         
-        for group, ingredients in self.NUTRITION_GROUPS.items():
-            if any(ingredient_lower in ing.lower() or ing.lower() in ingredient_lower 
-                   for ing in ingredients):
-                return group
-        
-        return None
+        # Ingredients listed in NUTRITION_GROUPS resolve with one dict lookup
+        return _INGREDIENT_TO_GROUP.get(ingredient_lower) or _scan_nutrition_groups(ingredient_lower)
     
     def _calculate_nutrition_similarity(
         self,
@@ -361,29 +408,18 @@ class PreferenceHandler:
     
     def _get_nutrition_importance(self, ingredient: str) -> str:
         """Get why this ingredient is nutritionally important."""
-        nutrition_importance = {
-            "spinach": "rich in iron and folate, crucial for blood health",
-            "carrot": "high in vitamin A, essential for vision and immune system",
-            "broccoli": "contains vitamin C, K, and fiber",
-            "lentils": "excellent plant-based protein and iron source",
-            "yogurt": "provides calcium and probiotics for gut health"
-        }
-        
-        for key, importance in nutrition_importance.items():
-            if key in ingredient.lower():
-                return importance
-        
-        return "important for balanced nutrition"
+        return _nutrition_importance(ingredient.lower())
     
     def _create_retry_plan(
         self,
         ingredient: str,
         baby: Baby,
-        reason: str
+        reason: str,
+        today: Optional[date] = None
     ) -> Dict[str, any]:
-        """Create structured retry plan."""
+        """Create structured retry plan (retry two weeks after `today`)."""
         return {
-            "next_retry_date": date.today() + timedelta(days=14),
+            "next_retry_date": (today or date.today()) + timedelta(days=14),
             "suggested_preparation": "different from previous attempt",
             "mixing_strategy": f"Try mixing with {baby.liked_ingredients[0] if baby.liked_ingredients else 'favorite food'}",
             "max_attempts": 5,
@@ -431,6 +467,47 @@ class PreferenceHandler:
         ]
 
 
+# NUTRITION_GROUPS flattened to (lower-cased ingredient, group), in group order
+_GROUP_MEMBERS = tuple(
+    (ing.lower(), group)
+    for group, ingredients in PreferenceHandler.NUTRITION_GROUPS.items()
+    for ing in ingredients
+)
+
+
+@lru_cache(maxsize=4096)
+def _scan_nutrition_groups(ingredient_lower: str) -> Optional[str]:
+    """First group with a member containing, or contained in, the ingredient (memoized)."""
+    return next(
+        (group for ing, group in _GROUP_MEMBERS if ingredient_lower in ing or ing in ingredient_lower),
+        None
+    )
+
+
+# The scan's answer for every listed ingredient, precomputed (e.g. "lentils"
+# resolves to iron_sources through "red lentils", as the scan would)
+_INGREDIENT_TO_GROUP = {ing: _scan_nutrition_groups(ing) for ing, _ in _GROUP_MEMBERS}
+
+# Why key ingredients matter, matched by substring of the ingredient name
+_NUTRITION_IMPORTANCE = {
+    "spinach": "rich in iron and folate, crucial for blood health",
+    "carrot": "high in vitamin A, essential for vision and immune system",
+    "broccoli": "contains vitamin C, K, and fiber",
+    "lentils": "excellent plant-based protein and iron source",
+    "yogurt": "provides calcium and probiotics for gut health"
+}
+
+
+@lru_cache(maxsize=4096)
+def _nutrition_importance(ingredient_lower: str) -> str:
+    """PreferenceHandler._get_nutrition_importance for a lower-cased name (memoized)."""
+    for key, importance in _NUTRITION_IMPORTANCE.items():
+        if key in ingredient_lower:
+            return importance
+    
+    return "important for balanced nutrition"
+
+
 class LLMAlternativeSuggester:
     """
     Uses LLM to suggest intelligent alternatives for disliked ingredients.
@@ -438,6 +515,15 @@ class LLMAlternativeSuggester:
     This is the killer feature that ChatGPT alone can't provide.
     """
     
+    # Nutritional role of each PreferenceHandler.NUTRITION_GROUPS group
+    NUTRITIONAL_ROLES = {
+        "vitamin_a_sources": "Essential for vision, immune function, and skin health",
+        "iron_sources": "Critical for blood formation and cognitive development",
+        "calcium_sources": "Vital for bone development and muscle function",
+        "protein_sources": "Building blocks for growth and development",
+        "vitamin_c_sources": "Supports immune system and iron absorption"
+    }
+    
     def __init__(self, llm_service):
         self.llm_service = llm_service
     
@@ -460,7 +546,7 @@ class LLMAlternativeSuggester:
 
 Baby Profile:
 - Age: {baby.age_months} months ({baby.age_stage} stage)
-- Already likes: {', '.join(baby.liked_ingredients) if baby.liked_ingredients else 'still exploring'}
+- Already likes: {baby.liked_ingredients_text or 'still exploring'}
 - Rejection reason: {reason}
 
 Nutritional role of {ingredient}: {self._get_nutritional_role(ingredient, nutrition_group)}
@@ -489,16 +575,13 @@ Format as JSON:
 }}
 """
 
-        # Call LLM
-        response = self.llm_service.client.chat.completions.create(
-            model="gpt-4o-mini",
+        # Call LLM (cached per identical prompt)
+        result = self.llm_service.complete(dict(
+            model=self.llm_service.fast_model,
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
             max_tokens=400
-        )
-        
-        import json
-        result = json.loads(response.choices[0].message.content)
+        ), parse=json.loads)
         return result.get('alternatives', [])
     
     def suggest_preparation_variations(
@@ -525,7 +608,7 @@ Suggest 3 different preparation methods for {ingredient} that:
 3. Are practical for busy parents
 4. Preserve nutritional value
 
-Baby's favorites: {', '.join(baby.liked_ingredients) if baby.liked_ingredients else 'None yet'}
+Baby's favorites: {baby.liked_ingredients_text or 'None yet'}
 
 Format as JSON:
 {{
@@ -540,15 +623,12 @@ Format as JSON:
 }}
 """
 
-        response = self.llm_service.client.chat.completions.create(
-            model="gpt-4o-mini",
+        result = self.llm_service.complete(dict(
+            model=self.llm_service.fast_model,
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
             max_tokens=400
-        )
-        
-        import json
-        result = json.loads(response.choices[0].message.content)
+        ), parse=json.loads)
         return result.get('preparations', [])
     
     def _get_nutritional_role(
@@ -557,12 +637,4 @@ Format as JSON:
         nutrition_group: Optional[str]
     ) -> str:
         """Get explanation of ingredient's nutritional importance."""
-        roles = {
-            "vitamin_a_sources": "Essential for vision, immune function, and skin health",
-            "iron_sources": "Critical for blood formation and cognitive development",
-            "calcium_sources": "Vital for bone development and muscle function",
-            "protein_sources": "Building blocks for growth and development",
-            "vitamin_c_sources": "Supports immune system and iron absorption"
-        }
-        
-        return roles.get(nutrition_group, "Important for balanced nutrition")
\ No newline at end of file
+        return self.NUTRITIONAL_ROLES.get(nutrition_group, "Important for balanced nutrition")
\ No newline at end of file
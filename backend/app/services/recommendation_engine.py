@@ -2,14 +2,188 @@
 Basic content-based recommendation engine for MVP.
 Later phases will add collaborative filtering and ML models.
 """
+import numpy as np
+from fastapi import Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Tuple
+from sqlalchemy import func, inspect, select
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
 from datetime import date, timedelta
 
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db
 from app.models.baby import Baby
-from app.models.recipe import Recipe
+from app.models.recipe import Recipe, ingredient_name_set
 from app.models.feedback import Feedback
+from app.schemas.dto import RecipeDTO
+
+
+# RecipeCorpus (recipe rows + scoring arrays) shared by every engine
+_recipe_corpus_cache = TTLCache(maxsize=1, ttl=settings.RECIPE_CORPUS_TTL_SECONDS)
+
+# Encoded (JSON bytes) recommendation lists, keyed by baby id then request variant
+_recommendation_cache = TTLCache(maxsize=1024, ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS)
+
+# Average accepted rating per recipe id (None = no accepted feedback yet)
+_recipe_rating_cache = TTLCache(maxsize=50_000, ttl=settings.RECIPE_STATS_TTL_SECONDS)
+_UNCACHED = object()
+
+
+def invalidate_recipe_corpus() -> None:
+    """Drop the cached recipe corpus (call after recipes are written)."""
+    _recipe_corpus_cache.clear()
+    _recommendation_cache.clear()
+
+
+def get_cached_recommendations(baby_id: int, variant: Hashable) -> Optional[bytes]:
+    """Return a previously stored JSON recommendation payload, if still fresh."""
+    return _recommendation_cache.get(baby_id, {}).get(variant)
+
+
+def cache_recommendations(baby_id: int, variant: Hashable, payload: bytes) -> None:
+    """Store a JSON recommendation payload for one request variant of a baby."""
+    variants = dict(_recommendation_cache.get(baby_id, {}))
+    variants[variant] = payload
+    _recommendation_cache.set(baby_id, variants)
+
+
+def invalidate_recommendations(baby_id: int) -> None:
+    """Forget every cached recommendation payload for a baby."""
+    _recommendation_cache.pop(baby_id)
+
+
+def invalidate_recipe_stats(recipe_ids: Iterable[int]) -> None:
+    """Forget cached feedback aggregates for recipes (call after feedback is written)."""
+    for recipe_id in recipe_ids:
+        _recipe_rating_cache.pop(recipe_id)
+
+
+def load_recipes_with_stats(db: Session, recipe_ids: Iterable[int]) -> List[Tuple[Recipe, int, Optional[float]]]:
+    """
+    Load recipes with their feedback count and average rating, in id order.
+
+    Recipe.feedbacks is lazy="raise"; use this instead of walking it per
+    recipe. One query: the recipes outer-joined to a grouped aggregate of
+    their feedbacks.
+    """
+    recipe_ids = list(recipe_ids)
+    stats = select(
+        Feedback.recipe_id,
+        func.count().label("feedback_count"),
+        func.avg(Feedback.rating).label("avg_rating")
+    ).where(
+        Feedback.recipe_id.in_(recipe_ids)
+    ).group_by(Feedback.recipe_id).subquery()
+
+    return [
+        tuple(row) for row in db.execute(
+            select(Recipe, func.coalesce(stats.c.feedback_count, 0), stats.c.avg_rating)
+            .outerjoin(stats, stats.c.recipe_id == Recipe.id)
+            .where(Recipe.id.in_(recipe_ids))
+            .order_by(Recipe.id)
+        )
+    ]
+
+
+class RecipeCorpus:
+    """
+    All recipes plus their scoring features laid out as NumPy arrays.
+
+    Each array has one entry per recipe row (in id order), so a baby's
+    eligibility and scores are computed for the whole corpus with array
+    operations instead of a Python loop over Recipe objects.
+    Ingredient and allergen membership are stored as boolean incidence
+    matrices over the distinct (lower-cased) ingredient names and allergens.
+
+    The arrays are built straight from the selected column rows; RecipeDTOs
+    are only constructed (once each) for recipes that are actually
+    returned, via recipe().
+    """
+
+    def __init__(self, rows: List[Mapping[str, Any]]):
+        self._rows = list(rows)
+        self._recipes: List[Optional[RecipeDTO]] = [None] * len(rows)
+        self.ids = np.array([r["id"] for r in rows], dtype=np.int64)
+        self.age_min = np.array([r["age_min_months"] for r in rows], dtype=np.float64)
+        self.age_max = np.array(
+            [np.inf if r["age_max_months"] is None else r["age_max_months"] for r in rows],
+            dtype=np.float64
+        )
+        self.meal_types = np.array([r["meal_type"] for r in rows], dtype=object)
+        self.nutrition = self._nutrition_scores() / 100.0
+
+        ingredient_names = [ingredient_name_set(r["ingredients"]) for r in rows]
+        self.ingredient_vocab, self.ingredient_matrix = self._incidence(ingredient_names)
+        self.allergen_vocab, self.allergen_matrix = self._incidence(
+            [set(r["allergens"] or []) for r in rows]
+        )
+        self._allergen_index = {name: i for i, name in enumerate(self.allergen_vocab)}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def recipe(self, index: int) -> RecipeDTO:
+        """
+        RecipeDTO for the row at index, built on first use.
+
+        Not an ORM instance, so it can be shared read-only across requests.
+        Concurrent first uses may each build one; either is fine.
+        """
+        recipe = self._recipes[index]
+        if recipe is None:
+            recipe = self._recipes[index] = RecipeDTO(**self._rows[index])
+        return recipe
+
+    def _nutrition_scores(self) -> np.ndarray:
+        """
+        Stored nutrition scores, computed for rows that don't have one yet.
+
+        Recipes saved before the column existed stay NULL until backfilled;
+        as NaN they would fail every score comparison and never be
+        recommended. Their rows get the computed score too.
+        """
+        scores = np.array([r["nutrition_score"] for r in self._rows], dtype=np.float64)
+        missing = np.flatnonzero(np.isnan(scores))
+        if missing.size:
+            scores[missing] = Recipe.batch_nutrition_scores(*(
+                [self._rows[i][column] for i in missing]
+                for column in ("protein_g", "fiber_g", "iron_mg", "calcium_mg", "vitamin_a_mcg", "sugar_g")
+            ))
+            for i in missing:
+                self._rows[i] = {**self._rows[i], "nutrition_score": float(scores[i])}
+        return scores
+
+    @staticmethod
+    def _incidence(rows: List[set]) -> Tuple[List[str], np.ndarray]:
+        """Build (vocabulary, bool matrix[recipe, term]) from per-recipe term sets."""
+        vocab = sorted(set().union(*rows)) if rows else []
+        index = {term: i for i, term in enumerate(vocab)}
+        matrix = np.zeros((len(rows), len(vocab)), dtype=bool)
+        for row, terms in enumerate(rows):
+            matrix[row, [index[term] for term in terms]] = True
+        return vocab, matrix
+
+    def ingredient_match_counts(self, terms: List[str]) -> np.ndarray:
+        """Per recipe, how many of terms appear in any of its ingredient names."""
+        counts = np.zeros(len(self), dtype=np.int64)
+        for term in terms:
+            term = term.lower()
+            columns = [i for i, name in enumerate(self.ingredient_vocab) if term in name]
+            if columns:
+                counts += self.ingredient_matrix[:, columns].any(axis=1)
+        return counts
+
+    def allergen_mask(self, allergens: List[str]) -> np.ndarray:
+        """Per recipe, whether it lists any of the given allergens."""
+        columns = [self._allergen_index[a] for a in allergens or [] if a in self._allergen_index]
+        if not columns:
+            return np.zeros(len(self), dtype=bool)
+        return self.allergen_matrix[:, columns].any(axis=1)
+
+
+def get_recommendation_engine(db: Session = Depends(get_db)) -> "RecommendationEngine":
+    """FastAPI dependency providing an engine bound to the request session."""
+    return RecommendationEngine(db)
 
 
 class RecommendationEngine:
@@ -32,10 +206,16 @@ class RecommendationEngine:
             count: int = 5,
             meal_type: str = None,
             exclude_recent_days: int = 7
-    ) -> List[Tuple[Recipe, float, str]]:
+    ) -> List[Tuple[RecipeDTO, float, str]]:
         """
         Get recipe recommendations for a baby.
 
+        Scoring (0-1) is computed for the whole corpus at once:
+        1. Base nutrition score (0.3 weight)
+        2. Preference match (0.3 weight)
+        3. Historical performance (0.4 weight)
+        Recipes containing the baby's allergens are disqualified.
+
         Args:
             baby: Baby profile
             count: Number of recommendations to return
@@ -45,85 +225,95 @@ class RecommendationEngine:
         Returns:
             List of tuples: (recipe, score, reason)
         """
-        # Get all eligible recipes
-        query = self.db.query(Recipe).filter(
-            Recipe.age_min_months <= baby.age_months
-        )
-
-        # Filter by age maximum if specified
-        query = query.filter(
-            (Recipe.age_max_months.is_(None)) |
-            (Recipe.age_max_months >= baby.age_months)
-        )
+        corpus = self._load_recipe_corpus()
 
-        # Filter by meal type if specified
+        # Eligible recipes: age range, meal type, no allergens
+        age_months = baby.age_months
+        eligible = (corpus.age_min <= age_months) & (corpus.age_max >= age_months)
         if meal_type:
-            query = query.filter(Recipe.meal_type == meal_type)
+            eligible &= corpus.meal_types == meal_type
+        eligible &= ~corpus.allergen_mask(baby.allergies)
 
-        recipes = query.all()
+        # The baby's feedback history drives both the recency filter and scoring
+        baby_feedbacks = self._load_baby_feedbacks(baby)
 
         # Exclude recently recommended recipes
         if exclude_recent_days > 0:
             recent_cutoff = date.today() - timedelta(days=exclude_recent_days)
-            recent_feedbacks = self.db.query(Feedback.recipe_id).filter(
-                Feedback.baby_id == baby.id,
-                Feedback.recommended_at >= recent_cutoff
-            ).distinct().all()
-
-            # Extract recipe_id from query results (each result is a tuple)
-            recent_recipe_ids = set(f[0] for f in recent_feedbacks)
-            recipes = [r for r in recipes if r.id not in recent_recipe_ids]
-
-        # Score each recipe
-        scored_recipes = []
-        for recipe in recipes:
-            score, reason = self._calculate_recipe_score(baby, recipe)
-            if score > 0:  # Only include recipes with positive scores
-                scored_recipes.append((recipe, score, reason))
-
-        # Sort by score and return top N
-        scored_recipes.sort(key=lambda x: x[1], reverse=True)
-        return scored_recipes[:count]
-
-    def _calculate_recipe_score(
-            self,
-            baby: Baby,
-            recipe: Recipe
-    ) -> Tuple[float, str]:
-        """
-        Calculate recommendation score for a recipe (0-1).
-
-        Scoring components:
-        1. Base nutrition score (0.3 weight)
-        2. Preference match (0.3 weight)
-        3. Historical performance (0.4 weight)
-
-        Returns:
-            (score, reason_for_recommendation)
-        """
-        reasons = []
+            recent_recipe_ids = [
+                f.recipe_id for f in baby_feedbacks
+                if f.recommended_at is not None and f.recommended_at >= recent_cutoff
+            ]
+            eligible &= ~np.isin(corpus.ids, recent_recipe_ids)
 
-        # Check for allergens (immediate disqualification)
-        if recipe.has_allergen(baby.allergies):
-            return 0.0, "Contains allergens"
+        candidates = np.flatnonzero(eligible)
+        if candidates.size == 0:
+            return []
 
         # 1. Nutrition score (0-1)
-        nutrition_score = recipe.get_nutrition_score() / 100.0
+        nutrition = corpus.nutrition[candidates]
 
         # 2. Preference match score (0-1)
-        preference_score = self._calculate_preference_score(baby, recipe)
+        liked = corpus.ingredient_match_counts(baby.liked_ingredients or [])[candidates]
+        disliked = corpus.ingredient_match_counts(baby.disliked_ingredients or [])[candidates]
+        preference = np.where(
+            disliked > 0, 0.1,  # Strong penalty for disliked ingredients
+            np.where(liked > 0, np.minimum(0.5 + liked * 0.2, 1.0), 0.5)
+        )
 
-        # 3. Historical performance score (0-1)
-        historical_score = self._calculate_historical_score(baby, recipe)
+        # 3. Historical performance score (0-1), neutral 0.5 without history
+        candidate_ids = corpus.ids[candidates]
+        historical_scores = self._load_historical_scores(baby_feedbacks, candidate_ids.tolist())
+        historical = np.array(
+            [historical_scores.get(recipe_id, 0.5) for recipe_id in candidate_ids.tolist()],
+            dtype=np.float64
+        )
 
         # Weighted combination
-        final_score = (
-                0.3 * nutrition_score +
-                0.3 * preference_score +
-                0.4 * historical_score
-        )
+        scores = 0.3 * nutrition + 0.3 * preference + 0.4 * historical
+
+        # Highest scores first; stable so ties keep corpus (id) order.
+        # Only the top `count` need ordering: partition out those reaching
+        # the count-th best score (ties included) and sort just them
+        order = np.flatnonzero(scores > 0)
+        if 0 < count < order.size:
+            kth = order.size - count
+            threshold = np.partition(scores[order], kth)[kth]
+            order = order[scores[order] >= threshold]
+        order = order[np.argsort(-scores[order], kind="stable")][:count]
+
+        # Convert the top-K slices to Python lists in one pass each
+        return [
+            (corpus.recipe(index), score, self._explain_score(n, p, h))
+            for index, score, n, p, h in zip(
+                candidates[order].tolist(),
+                scores[order].tolist(),
+                nutrition[order].tolist(),
+                preference[order].tolist(),
+                historical[order].tolist()
+            )
+        ]
+
+    def _load_recipe_corpus(self) -> RecipeCorpus:
+        """
+        Return every recipe and its scoring arrays, built at most once per TTL.
+
+        Recipe writes call invalidate_recipe_corpus().
+        """
+        corpus = _recipe_corpus_cache.get("recipes")
+        if corpus is None:
+            rows = self.db.execute(
+                select(*Recipe.__table__.columns).order_by(Recipe.id)
+            ).mappings().all()
+            corpus = RecipeCorpus(rows)
+            _recipe_corpus_cache.set("recipes", corpus)
+        return corpus
+
+    @staticmethod
+    def _explain_score(nutrition_score: float, preference_score: float, historical_score: float) -> str:
+        """Build the human-readable reason for a recommendation."""
+        reasons = []
 
-        # Build explanation
         if nutrition_score > 0.7:
             reasons.append("high nutritional value")
 
@@ -138,65 +328,70 @@ class RecommendationEngine:
         if not reasons:
             reasons.append("suitable for baby's age")
 
-        reason_text = ", ".join(reasons).capitalize()
-
-        return final_score, reason_text
-
-    def _calculate_preference_score(self, baby: Baby, recipe: Recipe) -> float:
-        """Calculate score based on ingredient preferences."""
-        if not recipe.ingredients:
-            return 0.5  # Neutral score if no ingredients listed
-
-        # Extract ingredient names from recipe
-        ingredient_names = [
-            ing.get('name', '').lower()
-            for ing in recipe.ingredients
-        ]
+        return ", ".join(reasons).capitalize()
 
-        liked_count = sum(
-            1 for liked in baby.liked_ingredients
-            if any(liked.lower() in ing for ing in ingredient_names)
-        )
-
-        disliked_count = sum(
-            1 for disliked in baby.disliked_ingredients
-            if any(disliked.lower() in ing for ing in ingredient_names)
-        )
-
-        # Strong penalty for disliked ingredients
-        if disliked_count > 0:
-            return 0.1
-
-        # Bonus for liked ingredients
-        if liked_count > 0:
-            return min(0.5 + (liked_count * 0.2), 1.0)
-
-        return 0.5  # Neutral score
-
-    def _calculate_historical_score(self, baby: Baby, recipe: Recipe) -> float:
+    def _load_baby_feedbacks(self, baby: Baby) -> list:
         """
-        Calculate score based on past feedback.
-        If no feedback exists, use general recipe performance.
+        Return the baby's feedback history (id, recipe_id, recommended_at,
+        feedback_score), using baby.feedbacks when the caller eager-loaded it.
         """
-        # Check baby's specific feedback for this recipe
-        baby_feedback = self.db.query(Feedback).filter(
-            Feedback.baby_id == baby.id,
-            Feedback.recipe_id == recipe.id
-        ).first()
-
-        if baby_feedback:
-            return baby_feedback.get_feedback_score()
-
-        # Check general performance of this recipe
-        avg_score = self.db.query(
-            func.avg(Feedback.rating)
+        if "feedbacks" not in inspect(baby).unloaded:
+            return baby.feedbacks
+
+        # Score computed in SQL; rows expose the same attributes as Feedback
+        return self.db.query(
+            Feedback.id,
+            Feedback.recipe_id,
+            Feedback.recommended_at,
+            Feedback.feedback_score.label("feedback_score")
         ).filter(
-            Feedback.recipe_id == recipe.id,
-            Feedback.accepted == True
-        ).scalar()
+            Feedback.baby_id == baby.id
+        ).all()
 
-        if avg_score:
-            return avg_score / 5.0  # Normalize to 0-1
+    def _load_historical_scores(self, baby_feedbacks: list, recipe_ids: List[int]) -> Dict[int, float]:
+        """
+        Calculate historical scores for all candidate recipes at once.
 
-        # No history - return neutral score
-        return 0.5
\ No newline at end of file
+        The baby's own feedback wins; otherwise the recipe's average accepted
+        rating is used. Recipes without any history are left out (neutral 0.5).
+        Averages come from the recipe stats cache; only uncached recipes are
+        queried, in one grouped query.
+        """
+        if not recipe_ids:
+            return {}
+
+        avg_ratings = {}
+        uncached = []
+        for recipe_id in recipe_ids:
+            avg_rating = _recipe_rating_cache.get(recipe_id, _UNCACHED)
+            if avg_rating is _UNCACHED:
+                uncached.append(recipe_id)
+            else:
+                avg_ratings[recipe_id] = avg_rating
+
+        # Check general performance of the remaining recipes in one grouped query
+        if uncached:
+            fetched = dict.fromkeys(uncached)
+            fetched.update(self.db.query(
+                Feedback.recipe_id, func.avg(Feedback.rating)
+            ).filter(
+                Feedback.recipe_id.in_(uncached),
+                Feedback.accepted == True
+            ).group_by(Feedback.recipe_id).all())
+            for recipe_id, avg_rating in fetched.items():
+                _recipe_rating_cache.set(recipe_id, avg_rating)
+            avg_ratings.update(fetched)
+
+        scores = {
+            recipe_id: avg_rating / 5.0  # Normalize to 0-1
+            for recipe_id, avg_rating in avg_ratings.items()
+            if avg_rating
+        }
+
+        # Baby's specific feedback overrides the general performance
+        own_scores = {}
+        for feedback in sorted(baby_feedbacks, key=lambda f: f.id):
+            own_scores.setdefault(feedback.recipe_id, feedback.feedback_score)
+        scores.update(own_scores)
+
+        return scores
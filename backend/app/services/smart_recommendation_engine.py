@@ -1,14 +1,19 @@
 """
 Smart Recommendation Engine with intelligent preference handling.
-Complete fixed version with debug output.
+Complete fixed version with debug output (logged at DEBUG level).
 """
-from typing import List, Dict, Any
+import heapq
+import logging
+from datetime import date
+from typing import List, Dict, Any, Iterator, Tuple
 from sqlalchemy.orm import Session
 
 from app.models.baby import Baby
 from app.models.recipe import Recipe
 from app.services.recommendation_engine import RecommendationEngine
-from app.services.preference_handler import PreferenceHandler
+from app.services.preference_handler import PreferenceHandler, LLMAlternativeSuggester
+
+logger = logging.getLogger(__name__)
 
 
 class SmartRecommendationEngine:
@@ -33,38 +38,57 @@ class SmartRecommendationEngine:
         
         Returns dict matching SmartRecommendationResponse schema.
         """
-        print(f"\n{'='*60}")
-        print(f"Smart Recommendations for {baby.name} ({baby.age_months} months)")
-        print(f"{'='*60}")
+        for _, result in self.iter_smart_recommendations(baby, count, meal_type):
+            pass
+        return result
+    
+    def iter_smart_recommendations(
+        self,
+        baby: Baby,
+        count: int = 10,
+        meal_type: str = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Get intelligent recommendations section by section, for streaming.
+        
+        Yields ("primary_recommendations", ...), ("alternatives", ...) and
+        ("retry_suggestions", ...) as each is ready, with rule-based text,
+        then ("complete", <dict matching SmartRecommendationResponse>) once
+        the LLM pass has filled in its text. Earlier sections are updated in
+        place by that pass, so consumers should encode them when yielded.
+        """
+        logger.debug("Smart recommendations for %s (%s months)", baby.name, baby.age_months)
         
         # Get primary recommendations
-        primary_recs = self._get_primary_recommendations(baby, count, meal_type)
-        print(f"Primary recommendations: {len(primary_recs)}")
+        primary_recs, sources = self._get_primary_recommendations(baby, count, meal_type)
+        logger.debug("Primary recommendations: %d", len(primary_recs))
+        yield "primary_recommendations", primary_recs
         
         # Get alternatives for disliked ingredients
         alternatives = self._get_alternatives_for_dislikes(baby)
-        print(f"Alternatives for: {list(alternatives.keys())}")
+        logger.debug("Alternatives for: %s", list(alternatives))
+        yield "alternatives", alternatives
         
         # Get retry suggestions
         retry_suggestions = self._get_retry_suggestions(baby)
-        print(f"Retry suggestions: {len(retry_suggestions)}")
+        logger.debug("Retry suggestions: %d", len(retry_suggestions))
+        yield "retry_suggestions", retry_suggestions
         
-        # Generate overall explanation
+        # Explanations, LLM alternatives, retry strategies and the overall
+        # explanation all come from one completion
         if self.llm_service:
             try:
-                overall_explanation = self._generate_overall_explanation(
-                    baby, primary_recs, alternatives
+                overall_explanation = self._apply_llm_text(
+                    baby, primary_recs, sources, alternatives, retry_suggestions
                 )
-                print(f"LLM explanation generated")
+                logger.debug("LLM text generated")
             except Exception as e:
-                print(f"LLM explanation failed: {e}")
+                logger.warning("LLM text generation failed: %s", e)
                 overall_explanation = f"Personalized recommendations for {baby.name}."
         else:
             overall_explanation = f"Personalized recommendations for {baby.name} based on age and preferences."
         
-        print(f"{'='*60}\n")
-        
-        return {
+        yield "complete", {
             "primary_recommendations": primary_recs,
             "alternatives": alternatives,
             "retry_suggestions": retry_suggestions,
@@ -77,8 +101,13 @@ class SmartRecommendationEngine:
         baby: Baby,
         count: int,
         meal_type: str
-    ) -> List[Dict]:
-        """Get primary recommendations with soft penalties."""
+    ) -> Tuple[List[Dict], List[Tuple[Recipe, str]]]:
+        """
+        Get primary recommendations with soft penalties.
+        
+        Explanations start as the rule engine's reason; the (recipe, reason)
+        pairs are returned alongside, in the same order, for the LLM pass.
+        """
         # Get candidates - no exclude to ensure we get results
         candidates = self.rule_engine.get_recommendations(
             baby=baby,
@@ -87,68 +116,61 @@ class SmartRecommendationEngine:
             exclude_recent_days=0  # Don't exclude recent for now
         )
         
-        print(f"  Rule engine returned {len(candidates)} candidates")
+        logger.debug("Rule engine returned %d candidates", len(candidates))
         
         if not candidates:
-            print("  No candidates! Check database has recipes.")
-            return []
+            logger.debug("No candidates! Check database has recipes.")
+            return [], []
         
         enhanced_recommendations = []
+        # Per-candidate score lines are only formatted when DEBUG is on
+        trace = logger.isEnabledFor(logging.DEBUG)
         
         for recipe, base_score, reason in candidates:
             # Calculate preference penalty
             penalty = self.preference_handler.calculate_preference_penalty(recipe, baby)
             adjusted_score = base_score * penalty
             
-            print(f"    {recipe.name[:30]:30} base={base_score:.3f} penalty={penalty:.2f} final={adjusted_score:.3f}")
+            if trace:
+                logger.debug(
+                    "  %-30s base=%.3f penalty=%.2f final=%.3f",
+                    recipe.name[:30], base_score, penalty, adjusted_score
+                )
             
             # Check if retry
             is_retry = self._is_retry_recommendation(recipe, baby)
             
-            # Generate explanation
-            if self.llm_service and adjusted_score > 0.3:
-                try:
-                    explanation = self.llm_service.generate_recipe_explanation(
-                        recipe, baby, reason
-                    )
-                except Exception as e:
-                    print(f"    LLM failed for {recipe.name}: {e}")
-                    explanation = reason
-            else:
-                explanation = reason
-            
             # Serialize recipe
             recipe_dict = self._serialize_recipe(recipe)
             
-            enhanced_recommendations.append({
+            enhanced_recommendations.append(({
                 "recipe": recipe_dict,
                 "score": adjusted_score,
-                "explanation": explanation,
+                "explanation": reason,
                 "is_retry": is_retry,
                 "penalty_applied": penalty < 1.0,
                 "original_score": base_score,
                 "nutritional_highlights": None
-            })
+            }, (recipe, reason)))
         
-        # Sort by adjusted score
-        enhanced_recommendations.sort(key=lambda x: x['score'], reverse=True)
+        # Top `count` by adjusted score (partial selection; ties keep rule-engine order)
+        final = heapq.nlargest(count, enhanced_recommendations, key=lambda x: x[0]['score'])
+        logger.debug("Selected top %d after sorting", len(final))
         
-        final = enhanced_recommendations[:count]
-        print(f"  Selected top {len(final)} after sorting")
-        
-        return final
+        return [rec for rec, _ in final], [source for _, source in final]
     
     def _get_alternatives_for_dislikes(self, baby: Baby) -> Dict[str, Any]:
         """Get alternatives for each disliked ingredient."""
         alternatives_dict = {}
         
+        # Nutritional alternatives for every dislike, from one recipe query
+        alternatives_by_disliked = self.preference_handler.find_nutritional_alternatives_bulk(
+            baby.disliked_ingredients or [], baby
+        )
+        
         for disliked in (baby.disliked_ingredients or []):
-            print(f"  Finding alternatives for '{disliked}'...")
-            
-            # Find nutritional alternatives
-            alt_recipes = self.preference_handler.find_nutritional_alternatives(
-                disliked, baby
-            )
+            logger.debug("Finding alternatives for '%s'", disliked)
+            alt_recipes = alternatives_by_disliked[disliked]
             
             # Format alternative recipes
             alternative_recipes_formatted = []
@@ -161,51 +183,37 @@ class SmartRecommendationEngine:
                     "reason": f"Similar nutrition to {disliked}"
                 })
             
-            # Get LLM suggestions
-            if self.llm_service:
-                try:
-                    from app.services.preference_handler import LLMAlternativeSuggester
-                    suggester = LLMAlternativeSuggester(self.llm_service)
-                    nutrition_group = self.preference_handler._find_nutrition_group(disliked)
-                    llm_suggestions = suggester.suggest_alternatives(
-                        ingredient=disliked,
-                        baby=baby,
-                        nutrition_group=nutrition_group,
-                        reason="baby_refused"
-                    )
-                except Exception as e:
-                    print(f"    LLM alternatives failed: {e}")
-                    llm_suggestions = []
-            else:
-                llm_suggestions = []
-            
+            # LLM suggestions are filled in by _apply_llm_text
             alternatives_dict[disliked] = {
                 "ingredient": disliked,
                 "nutrition_importance": self.preference_handler._get_nutrition_importance(disliked),
                 "alternative_recipes": alternative_recipes_formatted,
-                "llm_suggestions": llm_suggestions
+                "llm_suggestions": []
             }
             
-            print(f"    Found {len(alternative_recipes_formatted)} recipes, {len(llm_suggestions)} LLM suggestions")
+            logger.debug("Found %d alternative recipes", len(alternative_recipes_formatted))
         
         return alternatives_dict
     
     def _get_retry_suggestions(self, baby: Baby) -> List[Dict]:
         """Get retry suggestions for disliked ingredients."""
         retry_suggestions = []
+        today = date.today()  # One reference date for every ingredient
         
-        for disliked in (baby.disliked_ingredients or []):
-            should_retry, retry_reason = self.preference_handler.should_retry_ingredient(
-                disliked, baby
-            )
-            
+        decisions = [
+            (disliked, *self.preference_handler.should_retry_ingredient(disliked, baby, today=today))
+            for disliked in (baby.disliked_ingredients or [])
+        ]
+        
+        # Different preparations for every ingredient to retry, from one recipe query
+        preparations = self.preference_handler.suggest_different_preparations_bulk(
+            [disliked for disliked, should_retry, _ in decisions if should_retry], baby
+        )
+        
+        for disliked, should_retry, retry_reason in decisions:
             if should_retry:
-                print(f"  Generating retry strategy for '{disliked}'...")
-                
-                # Get different preparations
-                different_preps = self.preference_handler.suggest_different_preparations(
-                    disliked, baby
-                )
+                logger.debug("Generating retry strategy for '%s'", disliked)
+                different_preps = preparations[disliked]
                 
                 # Format as list of strings
                 different_preps_formatted = [
@@ -215,24 +223,13 @@ class SmartRecommendationEngine:
                 
                 attempt_count = self.preference_handler._get_attempt_count(baby, disliked)
                 
-                # Generate retry strategy
-                if self.llm_service:
-                    try:
-                        retry_strategy = self.preference_handler.generate_retry_recommendation(
-                            disliked, baby, attempt_count
-                        )
-                    except Exception as e:
-                        print(f"    Retry strategy generation failed: {e}")
-                        retry_strategy = {"strategy": "Try different preparation", "rationale": "Progressive exposure"}
-                else:
-                    retry_strategy = {"strategy": "Try different preparation", "rationale": "Progressive exposure"}
-                
+                # The LLM strategy replaces this in _apply_llm_text
                 retry_suggestions.append({
                     "ingredient": disliked,
                     "should_retry": True,
                     "reason": retry_reason,
                     "different_preparations": different_preps_formatted,
-                    "strategy": retry_strategy,
+                    "strategy": {"strategy": "Try different preparation", "rationale": "Progressive exposure"},
                     "attempt_count": attempt_count
                 })
         
@@ -240,78 +237,71 @@ class SmartRecommendationEngine:
     
     def _serialize_recipe(self, recipe: Recipe) -> Dict:
         """Convert Recipe SQLAlchemy object to dict for Pydantic."""
-        return {
-            "id": recipe.id,
-            "name": recipe.name,
-            "description": recipe.description,
-            "age_min_months": recipe.age_min_months,
-            "age_max_months": recipe.age_max_months,
-            "preparation_time_min": recipe.preparation_time_min,
-            "difficulty_level": recipe.difficulty_level,
-            "ingredients": recipe.ingredients,
-            "instructions": recipe.instructions,
-            "calories": recipe.calories,
-            "protein_g": recipe.protein_g,
-            "carbs_g": recipe.carbs_g,
-            "fat_g": recipe.fat_g,
-            "fiber_g": recipe.fiber_g,
-            "sugar_g": recipe.sugar_g,
-            "iron_mg": recipe.iron_mg,
-            "calcium_mg": recipe.calcium_mg,
-            "vitamin_a_mcg": recipe.vitamin_a_mcg,
-            "vitamin_c_mg": recipe.vitamin_c_mg,
-            "vitamin_d_mcg": recipe.vitamin_d_mcg,
-            "meal_type": recipe.meal_type,
-            "cuisine": recipe.cuisine,
-            "tags": recipe.tags,
-            "allergens": recipe.allergens,
-            "serving_size_g": recipe.serving_size_g,
-            "nutrition_score": recipe.get_nutrition_score()
-        }
+        return recipe.to_response_dict()
     
     def _is_retry_recommendation(self, recipe: Recipe, baby: Baby) -> bool:
         """Check if recipe contains previously disliked ingredients."""
-        ingredient_names = [
-            ing.get('name', '').lower() 
-            for ing in (recipe.ingredients or [])
-        ]
-        
-        for disliked in (baby.disliked_ingredients or []):
-            if any(disliked.lower() in ing for ing in ingredient_names):
-                return True
-        
-        return False
+        return any(
+            disliked in ing
+            for disliked in baby.disliked_ingredients_lc
+            for ing in recipe.ingredient_names_lc
+        )
     
-    def _generate_overall_explanation(
+    def _apply_llm_text(
         self,
         baby: Baby,
         primary_recs: List[Dict],
-        alternatives: Dict
+        sources: List[Tuple[Recipe, str]],
+        alternatives: Dict,
+        retry_suggestions: List[Dict]
     ) -> str:
-        """Generate overall recommendation explanation using LLM."""
-        if not self.llm_service:
-            return f"Personalized recommendations for {baby.name}"
+        """
+        Fill in LLM-written text from a single completion.
         
-        summary_prompt = f"""Summarize this meal recommendation strategy for parents.
-
-Baby: {baby.name}, {baby.age_months} months
-
-Today's recommendations ({len(primary_recs)} recipes):
-{chr(10).join(f"- {rec['recipe']['name']}" for rec in primary_recs[:5])}
-
-Foods being retried: {len([r for r in primary_recs if r['is_retry']])}
-Alternative ingredients suggested: {len(alternatives)}
-
-Write a brief, warm message (2-3 sentences) explaining the strategy.
-Keep it encouraging and parent-friendly."""
-
-        try:
-            response = self.llm_service.client.chat.completions.create(
-                model=self.llm_service.model,
-                messages=[{"role": "user", "content": summary_prompt}],
-                max_tokens=150
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"LLM explanation failed: {e}")
-            return f"Personalized recommendations for {baby.name} based on nutritional needs and preferences."
\ No newline at end of file
+        Sets explanations for recommendations scoring above 0.3, LLM
+        alternative suggestions and retry strategies in place, and returns
+        the overall explanation. Anything the model leaves out keeps its
+        rule-based fallback.
+        """
+        explained = [
+            index for index, rec in enumerate(primary_recs)
+            if rec['score'] > 0.3
+        ]
+        suggester = LLMAlternativeSuggester(self.llm_service)
+        
+        result = self.llm_service.generate_recommendation_bundle(
+            baby=baby,
+            recipes=[sources[index] for index in explained],
+            alternatives={
+                ingredient: suggester._get_nutritional_role(
+                    ingredient, self.preference_handler._find_nutrition_group(ingredient)
+                )
+                for ingredient in alternatives
+            },
+            retries={
+                retry['ingredient']: {
+                    "attempt_count": retry['attempt_count'],
+                    "nutrition_importance": self.preference_handler._get_nutrition_importance(retry['ingredient'])
+                }
+                for retry in retry_suggestions
+            },
+            retry_count=sum(1 for rec in primary_recs if rec['is_retry'])
+        )
+        
+        for index, explanation in zip(explained, result.get('explanations') or []):
+            if isinstance(explanation, str) and explanation:
+                primary_recs[index]['explanation'] = explanation
+        
+        llm_alternatives = result.get('alternatives') or {}
+        for ingredient, entry in alternatives.items():
+            suggestions = llm_alternatives.get(ingredient)
+            if isinstance(suggestions, list):
+                entry['llm_suggestions'] = suggestions
+        
+        strategies = result.get('retry_strategies') or {}
+        for retry in retry_suggestions:
+            strategy = strategies.get(retry['ingredient'])
+            if isinstance(strategy, dict):
+                retry['strategy'] = strategy
+        
+        return result.get('overall_explanation') or f"Personalized recommendations for {baby.name}."
@@ -5,9 +5,10 @@ Run this after the database tables are created.
 Usage:
     python seed_database.py
 """
-import json
 from pathlib import Path
 
+import orjson
+
 from app.core.database import SessionLocal
 from app.models.recipe import Recipe
 
@@ -22,8 +23,7 @@ def load_seed_recipes():
         print(f"Error: {seed_file} not found")
         return
 
-    with open(seed_file, 'r') as f:
-        recipes_data = json.load(f)
+    recipes_data = orjson.loads(seed_file.read_bytes())
 
     # Create database session
     db = SessionLocal()
@@ -39,21 +39,24 @@ def load_seed_recipes():
                 print("Seed operation cancelled.")
                 return
 
-        # Add recipes
+        # Names already in the database, in one query
+        seen_names = {
+            name for (name,) in db.query(Recipe.name).filter(
+                Recipe.name.in_([recipe_data['name'] for recipe_data in recipes_data])
+            )
+        }
+
+        # Add recipes (ORM objects, so the insert hooks fill nutrition_score
+        # and the recipe_ingredients rows)
         added_count = 0
         for recipe_data in recipes_data:
-            # Check if recipe with same name exists
-            existing = db.query(Recipe).filter(
-                Recipe.name == recipe_data['name']
-            ).first()
-
-            if existing:
+            if recipe_data['name'] in seen_names:
                 print(f"Recipe '{recipe_data['name']}' already exists, skipping...")
                 continue
 
             # Create new recipe
-            recipe = Recipe(**recipe_data)
-            db.add(recipe)
+            db.add(Recipe(**recipe_data))
+            seen_names.add(recipe_data['name'])
             added_count += 1
             print(f"Added recipe: {recipe_data['name']}")
 
@@ -2,19 +2,34 @@
 Basic tests for API endpoints.
 Run with: pytest tests/test_api.py
 """
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 from datetime import date, timedelta
 
+from app.core.database import SessionLocal
 from app.main import app
+from app.models.recipe import Recipe
+
 
-client = TestClient(app)
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient, and one app startup/shutdown, shared by every test."""
+    with TestClient(app) as test_client:
+        # Signed in as a fresh user: baby and feedback endpoints require auth
+        response = test_client.post("/api/v1/auth/register", json={
+            "email": f"test-{uuid.uuid4().hex}@example.com",
+            "password": "test-password"
+        })
+        test_client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        yield test_client
 
 
 class TestRootEndpoints:
     """Test root and health check endpoints."""
 
-    def test_root(self):
+    def test_root(self, client):
         """Test root endpoint returns API info."""
         response = client.get("/")
         assert response.status_code == 200
@@ -23,7 +38,7 @@ class TestRootEndpoints:
         assert "version" in data
         assert data["status"] == "running"
 
-    def test_health_check(self):
+    def test_health_check(self, client):
         """Test health check endpoint."""
         response = client.get("/health")
         assert response.status_code == 200
@@ -47,7 +62,7 @@ class TestBabyEndpoints:
             "disliked_ingredients": []
         }
 
-    def test_create_baby(self, sample_baby_data):
+    def test_create_baby(self, client, sample_baby_data):
         """Test creating a new baby profile."""
         response = client.post("/api/v1/babies/", json=sample_baby_data)
         assert response.status_code == 201
@@ -57,7 +72,7 @@ class TestBabyEndpoints:
         assert "age_months" in data
         assert "age_stage" in data
 
-    def test_list_babies(self, sample_baby_data):
+    def test_list_babies(self, client, sample_baby_data):
         """Test listing baby profiles."""
         # Create a baby first
         client.post("/api/v1/babies/", json=sample_baby_data)
@@ -66,10 +81,16 @@ class TestBabyEndpoints:
         response = client.get("/api/v1/babies/")
         assert response.status_code == 200
         data = response.json()
-        assert isinstance(data, list)
-        assert len(data) > 0
+        assert isinstance(data["items"], list)
+        assert len(data["items"]) > 0
 
-    def test_get_baby(self, sample_baby_data):
+    def test_list_babies_rejects_bad_limit(self, client):
+        """Test page sizes outside 1..1000 are rejected."""
+        for limit in (0, -1, 1001):
+            response = client.get("/api/v1/babies/", params={"limit": limit})
+            assert response.status_code == 422
+
+    def test_get_baby(self, client, sample_baby_data):
         """Test getting a specific baby profile."""
         # Create a baby
         create_response = client.post("/api/v1/babies/", json=sample_baby_data)
@@ -83,7 +104,7 @@ class TestBabyEndpoints:
         assert "total_feedbacks" in data
         assert "average_rating" in data
 
-    def test_update_baby(self, sample_baby_data):
+    def test_update_baby(self, client, sample_baby_data):
         """Test updating a baby profile."""
         # Create a baby
         create_response = client.post("/api/v1/babies/", json=sample_baby_data)
@@ -95,6 +116,24 @@ class TestBabyEndpoints:
         assert response.status_code == 200
         assert response.json()["weight_kg"] == 8.0
 
+    def test_get_baby_etag(self, client, sample_baby_data):
+        """Test If-None-Match on baby details until the profile changes."""
+        create_response = client.post("/api/v1/babies/", json=sample_baby_data)
+        baby_id = create_response.json()["id"]
+
+        response = client.get(f"/api/v1/babies/{baby_id}")
+        etag = response.headers["ETag"]
+
+        response = client.get(f"/api/v1/babies/{baby_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        client.patch(f"/api/v1/babies/{baby_id}", json={"weight_kg": 8.0})
+        response = client.get(f"/api/v1/babies/{baby_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["weight_kg"] == 8.0
+
 
 class TestRecipeEndpoints:
     """Test recipe CRUD operations."""
@@ -124,7 +163,7 @@ class TestRecipeEndpoints:
             "allergens": []
         }
 
-    def test_create_recipe(self, sample_recipe_data):
+    def test_create_recipe(self, client, sample_recipe_data):
         """Test creating a new recipe."""
         response = client.post("/api/v1/recipes/", json=sample_recipe_data)
         assert response.status_code == 201
@@ -132,7 +171,7 @@ class TestRecipeEndpoints:
         assert data["name"] == sample_recipe_data["name"]
         assert "nutrition_score" in data
 
-    def test_list_recipes(self, sample_recipe_data):
+    def test_list_recipes(self, client, sample_recipe_data):
         """Test listing recipes."""
         # Create a recipe first
         client.post("/api/v1/recipes/", json=sample_recipe_data)
@@ -141,15 +180,73 @@ class TestRecipeEndpoints:
         response = client.get("/api/v1/recipes/")
         assert response.status_code == 200
         data = response.json()
-        assert isinstance(data, list)
-        assert len(data) > 0
+        assert isinstance(data["items"], list)
+        assert len(data["items"]) > 0
+
+    def test_get_recipe_etag(self, client, sample_recipe_data):
+        """Test If-None-Match on recipe details until the recipe changes."""
+        create_response = client.post("/api/v1/recipes/", json=sample_recipe_data)
+        recipe_id = create_response.json()["id"]
+
+        response = client.get(f"/api/v1/recipes/{recipe_id}")
+        etag = response.headers["ETag"]
+
+        response = client.get(f"/api/v1/recipes/{recipe_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        client.patch(f"/api/v1/recipes/{recipe_id}", json={"preparation_time_min": 20})
+        response = client.get(f"/api/v1/recipes/{recipe_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["preparation_time_min"] == 20
+
+    def test_update_recipe_ingredients(self, client, sample_recipe_data):
+        """Test that updating ingredients updates ingredient lookups."""
+        create_response = client.post("/api/v1/recipes/", json=sample_recipe_data)
+        recipe_id = create_response.json()["id"]
+
+        # Replace banana with pea
+        update_data = {"ingredients": [{"name": "Pea", "quantity": "2", "unit": "tbsp"}]}
+        response = client.patch(f"/api/v1/recipes/{recipe_id}", json=update_data)
+        assert response.status_code == 200
+        assert response.json()["ingredients"] == update_data["ingredients"]
+
+        # Ingredient searches (alternatives, preparations) see the new list
+        with SessionLocal() as db:
+            with_pea = {id_ for (id_,) in db.query(Recipe.id).filter(Recipe.contains_ingredient("pea"))}
+            with_banana = {id_ for (id_,) in db.query(Recipe.id).filter(Recipe.contains_ingredient("banana"))}
+        assert recipe_id in with_pea
+        assert recipe_id not in with_banana
+
+    def test_list_recipes_keyset_pagination(self, client, sample_recipe_data):
+        """Test paging through recipes with after_id."""
+        client.post("/api/v1/recipes/", json=sample_recipe_data)
+        client.post("/api/v1/recipes/", json=sample_recipe_data)
+
+        first_page = client.get("/api/v1/recipes/", params={"limit": 1}).json()
+        assert len(first_page["items"]) == 1
+        assert first_page["has_next"] is True
+        assert first_page["next_after_id"] == first_page["items"][0]["id"]
+
+        second_page = client.get(
+            "/api/v1/recipes/",
+            params={"limit": 1, "after_id": first_page["next_after_id"]}
+        ).json()
+        assert second_page["items"][0]["id"] > first_page["items"][0]["id"]
+
+    def test_list_recipes_rejects_bad_limit(self, client):
+        """Test page sizes outside 1..1000 are rejected."""
+        for limit in (0, -1, 1001):
+            response = client.get("/api/v1/recipes/", params={"limit": limit})
+            assert response.status_code == 422
 
 
 class TestRecommendations:
     """Test recommendation functionality."""
 
     @pytest.fixture
-    def setup_data(self):
+    def setup_data(self, client):
         """Set up baby and recipes for recommendation tests."""
         # Create baby
         baby_data = {
@@ -175,7 +272,7 @@ class TestRecommendations:
 
         return {"baby_id": baby_id, "recipe_id": recipe_id}
 
-    def test_get_recommendations(self, setup_data):
+    def test_get_recommendations(self, client, setup_data):
         """Test getting recipe recommendations."""
         request_data = {
             "baby_id": setup_data["baby_id"],
@@ -189,7 +286,7 @@ class TestRecommendations:
             assert "recommendation_score" in recipe
             assert "match_reason" in recipe
 
-    def test_submit_feedback(self, setup_data):
+    def test_submit_feedback(self, client, setup_data):
         """Test submitting feedback."""
         feedback_data = {
             "baby_id": setup_data["baby_id"],
@@ -203,4 +300,34 @@ class TestRecommendations:
         assert response.status_code == 201
         data = response.json()
         assert "feedback_score" in data
-        assert data["rating"] == 4.5
\ No newline at end of file
+        assert data["rating"] == 4.5
+
+    def test_list_feedbacks_keyset_pagination(self, client, setup_data):
+        """Test paging through a baby's feedbacks, newest first, with before_id."""
+        feedback_ids = []
+        for rating in (3.0, 4.0, 5.0):
+            response = client.post("/api/v1/recommendations/feedback", json={
+                "baby_id": setup_data["baby_id"],
+                "recipe_id": setup_data["recipe_id"],
+                "rating": rating,
+                "accepted": True
+            })
+            feedback_ids.append(response.json()["id"])
+
+        url = f"/api/v1/recommendations/feedback/{setup_data['baby_id']}"
+        first_page = client.get(url, params={"limit": 2}).json()
+        assert [feedback["id"] for feedback in first_page["items"]] == feedback_ids[:0:-1]
+        assert first_page["has_next"] is True
+        assert first_page["next_before_id"] == feedback_ids[1]
+
+        second_page = client.get(
+            url,
+            params={"limit": 2, "before_id": first_page["next_before_id"]}
+        ).json()
+        assert [feedback["id"] for feedback in second_page["items"]] == feedback_ids[:1]
+        assert second_page["has_next"] is False
+        assert second_page["next_before_id"] is None
+
+        # Page sizes outside 1..1000 are rejected
+        for limit in (0, -3, 1001):
+            assert client.get(url, params={"limit": limit}).status_code == 422
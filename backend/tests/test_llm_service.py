@@ -0,0 +1,246 @@
+"""
+Unit tests for the LLM service's concurrency controls, against a fake OpenAI client.
+Run with: pytest tests/test_llm_service.py
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import orjson
+import pytest
+from openai import APIConnectionError
+
+from app.services import llm_service
+from app.services.llm_service import (
+    CircuitBreaker,
+    LLMScheduler,
+    LLMService,
+    LLMUnavailableError,
+    _completion_cache
+)
+
+
+REQUEST = {"model": "test-model", "messages": [{"role": "user", "content": "Hello"}], "max_tokens": 10}
+
+
+def _outage_error() -> APIConnectionError:
+    return APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+class FakeAsyncClient:
+    """
+    Stands in for AsyncOpenAI's raw-response completions call.
+
+    Each call waits for `release`, then answers `content` (or raises `error`).
+    """
+
+    def __init__(self, content: str = "An answer", error: Exception = None):
+        self.content = content
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self.create)
+        ))
+
+    async def create(self, **request):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        body = {
+            "choices": [{"message": {"content": self.content}, "finish_reason": "stop"}],
+            "usage": {"completion_tokens": 2}
+        }
+        return SimpleNamespace(http_response=SimpleNamespace(content=orjson.dumps(body)))
+
+
+class FakeClock:
+    """time.monotonic replacement that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def empty_completion_cache():
+    """Every test starts without cached answers."""
+    _completion_cache.clear()
+    yield
+    _completion_cache.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze the service module's clock."""
+    fake = FakeClock()
+    monkeypatch.setattr(llm_service, "time", fake)
+    return fake
+
+
+def _service(client: FakeAsyncClient) -> LLMService:
+    service = LLMService(api_key="test-key")
+    service.async_client = client
+    return service
+
+
+async def _until_called(client: FakeAsyncClient, calls: int) -> None:
+    """Let the event loop run until the fake client has been called `calls` times."""
+    for _ in range(100):
+        if client.calls >= calls:
+            return
+        await asyncio.sleep(0)
+    pytest.fail(f"Expected {calls} OpenAI calls, got {client.calls}")
+
+
+class TestSingleFlight:
+    """Test that identical concurrent completions share one request."""
+
+    @pytest.mark.asyncio
+    async def test_waiters_share_one_fetch(self):
+        """Test concurrent identical requests make one call and get the same answer."""
+        client = FakeAsyncClient(content="Shared answer")
+        service = _service(client)
+
+        tasks = [asyncio.create_task(service.acomplete(REQUEST)) for _ in range(5)]
+        await _until_called(client, 1)
+        client.release.set()
+
+        assert await asyncio.gather(*tasks) == ["Shared answer"] * 5
+        assert client.calls == 1
+        assert not llm_service._inflight_completions
+
+    @pytest.mark.asyncio
+    async def test_error_reaches_every_waiter(self):
+        """Test a failed fetch raises its error in the leader and all waiters."""
+        error = _outage_error()
+        client = FakeAsyncClient(error=error)
+        service = _service(client)
+
+        tasks = [asyncio.create_task(service.acomplete(REQUEST)) for _ in range(3)]
+        await _until_called(client, 1)
+        client.release.set()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert results == [error] * 3
+        assert client.calls == 1
+        assert _completion_cache.get(llm_service._completion_cache_key(REQUEST)) is None
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_hands_off_to_waiter(self):
+        """Test a waiter fetches the answer itself when the request it waited on is cancelled."""
+        client = FakeAsyncClient(content="Answer")
+        service = _service(client)
+
+        leader = asyncio.create_task(service.acomplete(REQUEST))
+        await _until_called(client, 1)
+        waiter = asyncio.create_task(service.acomplete(REQUEST))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await _until_called(client, 2)
+        client.release.set()
+
+        assert await waiter == "Answer"
+        assert leader.cancelled()
+        assert client.calls == 2
+
+
+class TestCircuitBreaker:
+    """Test the breaker's open and close transitions."""
+
+    def _fail(self, breaker: CircuitBreaker) -> None:
+        with pytest.raises(APIConnectionError):
+            with breaker.guard():
+                raise _outage_error()
+
+    def test_opens_after_fail_max_failures(self, clock):
+        """Test calls are refused once fail_max consecutive calls failed."""
+        breaker = CircuitBreaker(fail_max=3, reset_timeout=30)
+        for _ in range(2):
+            self._fail(breaker)
+        with breaker.guard():
+            pass  # Still closed: failures below fail_max
+
+        for _ in range(3):
+            self._fail(breaker)
+        with pytest.raises(LLMUnavailableError):
+            with breaker.guard():
+                pytest.fail("An open breaker must not run the call")
+
+    def test_closes_after_reset_timeout(self, clock):
+        """Test calls go through again after reset_timeout, and a success closes the breaker."""
+        breaker = CircuitBreaker(fail_max=2, reset_timeout=30)
+        for _ in range(2):
+            self._fail(breaker)
+
+        clock.now += 29
+        with pytest.raises(LLMUnavailableError):
+            with breaker.guard():
+                pass
+
+        clock.now += 1
+        with breaker.guard():
+            pass
+        # Closed again: one more failure doesn't reopen it
+        self._fail(breaker)
+        with breaker.guard():
+            pass
+
+    def test_failure_after_reset_timeout_reopens(self, clock):
+        """Test a failed trial call reopens the breaker for another reset_timeout."""
+        breaker = CircuitBreaker(fail_max=2, reset_timeout=30)
+        for _ in range(2):
+            self._fail(breaker)
+
+        clock.now += 30
+        self._fail(breaker)
+        with pytest.raises(LLMUnavailableError):
+            with breaker.guard():
+                pass
+
+
+class TestScheduler:
+    """Test the request and token buckets."""
+
+    @pytest.fixture
+    def sleeps(self, clock, monkeypatch):
+        """Record asyncio.sleep delays, advancing the fake clock instead of waiting."""
+        delays = []
+        real_sleep = asyncio.sleep
+
+        async def fake_sleep(delay, *args, **kwargs):
+            delays.append(delay)
+            clock.now += delay
+            await real_sleep(0)
+
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        return delays
+
+    @pytest.mark.asyncio
+    async def test_no_delay_within_budget(self, sleeps):
+        """Test requests inside both budgets go out immediately."""
+        scheduler = LLMScheduler(requests_per_minute=3, tokens_per_minute=300)
+        for _ in range(3):
+            await scheduler.acquire(100)
+        assert sleeps == []
+
+    @pytest.mark.asyncio
+    async def test_delays_once_requests_exhausted(self, sleeps):
+        """Test a request past the request budget waits for one request to refill."""
+        scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=100_000)
+        for _ in range(60):
+            await scheduler.acquire(1)
+        await scheduler.acquire(1)
+        assert sleeps == [pytest.approx(1.0)]
+
+    @pytest.mark.asyncio
+    async def test_delays_once_tokens_exhausted(self, sleeps):
+        """Test a request past the token budget waits for its tokens to refill."""
+        scheduler = LLMScheduler(requests_per_minute=100, tokens_per_minute=600)
+        await scheduler.acquire(600)
+        await scheduler.acquire(300)
+        assert sleeps == [pytest.approx(30.0)]
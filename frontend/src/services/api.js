@@ -67,12 +67,12 @@ const handleError = (error) => {
 
 export const babyAPI = {
     /**
-     * Get all babies
+     * Get all babies (first page; response also carries next_after_id)
      */
     getAll: async () => {
         try {
             const response = await api.get('/babies/');
-            return response.data;
+            return response.data.items;
         } catch (error) {
             handleError(error);
         }
@@ -215,12 +215,12 @@ export const recommendationAPI = {
 
 export const recipeAPI = {
     /**
-     * Get all recipes
+     * Get all recipes (pass after_id in filters to fetch the next page)
      */
     getAll: async (filters = {}) => {
         try {
             const response = await api.get('/recipes/', { params: filters });
-            return response.data;
+            return response.data.items;
         } catch (error) {
             handleError(error);
         }